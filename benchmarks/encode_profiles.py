@@ -0,0 +1,110 @@
+"""Encode time versus size for each screenshot encoding profile.
+
+Usage:
+    python benchmarks/encode_profiles.py [--frames DIR] [--repeat N]
+
+Frames are read from DIR (e.g. data/screenshots) when given, otherwise
+synthetic 1280x720 frames with gradients, flat UI areas, text and noise
+stand in for video captures. The previous hard-coded setting (WEBP q80
+method 6) is included as a reference row.
+"""
+from pathlib import Path
+import argparse
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+from modules.screenshot_manager.encoding import (  # noqa: E402
+    ENCODING_PROFILES, encode_image, format_available, resolve_profile
+)
+
+FRAME_SIZE = (1280, 720)
+REFERENCE = ('WEBP q80 m6 (previous)', 'WEBP', {'quality': 80, 'method': 6})
+
+
+def synthetic_frames(count: int = 4):
+    rng = random.Random(42)
+    frames = []
+    for i in range(count):
+        image = Image.linear_gradient('L').resize(FRAME_SIZE).convert('RGB')
+        image = Image.merge('RGB', (
+            image.getchannel(0),
+            image.getchannel(0).rotate(90 * i, expand=False),
+            Image.effect_noise(FRAME_SIZE, 40).point(lambda v: v // 2 + 40),
+        ))
+        draw = ImageDraw.Draw(image)
+        for _ in range(12):
+            x, y = rng.randrange(FRAME_SIZE[0]), rng.randrange(FRAME_SIZE[1])
+            fill = tuple(rng.randrange(256) for _ in range(3))
+            draw.rectangle((x, y, x + rng.randrange(50, 400), y + rng.randrange(30, 200)), fill=fill)
+        for line in range(8):
+            draw.text((60, 420 + line * 30), f"Slide {i} bullet point {line}: sample lecture text", fill='white')
+        frames.append(image.filter(ImageFilter.SMOOTH))
+    return frames
+
+
+def load_frames(frames_dir: Path, limit: int = 8):
+    frames = []
+    # The store shards frames into {bucket}/{video_id}/ directories; derivatives
+    # (name@thumb.webp) are downscaled copies, not captured frames
+    paths = [path for path in frames_dir.rglob('*') if path.is_file() and '@' not in path.name]
+    for path in sorted(paths)[:limit * 4]:
+        try:
+            with Image.open(path) as image:
+                frames.append(image.convert('RGB').resize(FRAME_SIZE))
+        except Exception:
+            continue
+        if len(frames) >= limit:
+            break
+    return frames
+
+
+def measure(frames, image_format: str, options: dict, repeat: int):
+    times, sizes = [], []
+    for frame in frames:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = encode_image(frame, image_format, options)
+            times.append((time.perf_counter() - started) * 1000)
+        sizes.append(len(data))
+    return statistics.median(times), statistics.mean(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=Path, help='directory of captured frames to encode')
+    parser.add_argument('--repeat', type=int, default=3, help='encodes per frame and profile')
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames) if args.frames else synthetic_frames()
+    if not frames:
+        sys.exit(f"No readable frames in {args.frames}")
+    print(f"{len(frames)} frames at {FRAME_SIZE[0]}x{FRAME_SIZE[1]}, {args.repeat} encodes each\n")
+
+    rows = [REFERENCE]
+    for profile in ENCODING_PROFILES:
+        try:
+            image_format, options = resolve_profile(profile)
+        except ValueError as e:
+            print(f"skipping {profile}: {e}")
+            continue
+        rows.append((profile, image_format, options))
+    skipped = [f for f in ('AVIF',) if not format_available(f)]
+    if skipped:
+        print(f"(not available in this Pillow build: {', '.join(skipped)})\n")
+
+    results = [(name, image_format) + measure(frames, image_format, options, args.repeat)
+               for name, image_format, options in rows]
+    reference_ms, reference_bytes = results[0][2], results[0][3]
+    print(f"{'profile':<26}{'format':<8}{'median ms':>10}{'avg KB':>10}{'speedup':>9}{'size':>8}")
+    for name, image_format, median_ms, mean_bytes in results:
+        print(f"{name:<26}{image_format:<8}{median_ms:>10.1f}{mean_bytes / 1024:>10.1f}"
+              f"{reference_ms / median_ms:>8.1f}x{mean_bytes / reference_bytes:>7.0%}")
+
+
+if __name__ == '__main__':
+    main()
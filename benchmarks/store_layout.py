@@ -0,0 +1,101 @@
+"""Lookup and listing cost of the flat versus sharded screenshot layout.
+
+Usage:
+    python benchmarks/store_layout.py [--files 100000] [--per-video 50] [--dir PATH]
+
+Creates empty files in both layouts under a temporary directory (or --dir,
+which should be on the same kind of filesystem as the real store) and
+times per-file lookups, listing one video's files, and a full walk. Use
+--files 1000000 for the large case; creating the files takes a while.
+"""
+from pathlib import Path
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.screenshot_manager.layout import video_dir  # noqa: E402
+
+
+def build(root: Path, files: int, per_video: int, sharded: bool):
+    videos = []
+    for v in range(max(1, files // per_video)):
+        video_id = f"{v:011d}"
+        videos.append(video_id)
+        directory = video_dir(root, video_id) if sharded else root
+        directory.mkdir(parents=True, exist_ok=True)
+        for ts in range(per_video):
+            open(directory / f"yt_{video_id}_{ts}.webp", "wb").close()
+    return videos
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def run(root: Path, videos, per_video: int, sharded: bool, samples: int = 2000):
+    rng = random.Random(7)
+    picks = [(rng.choice(videos), rng.randrange(per_video)) for _ in range(samples)]
+    listing_videos = [rng.choice(videos) for _ in range(20)]
+
+    def path_for(video_id, ts):
+        directory = video_dir(root, video_id) if sharded else root
+        return directory / f"yt_{video_id}_{ts}.webp"
+
+    def lookups():
+        for video_id, ts in picks:
+            path_for(video_id, ts).is_file()
+
+    def list_video():
+        for video_id in listing_videos:
+            if sharded:
+                os.listdir(video_dir(root, video_id))
+            else:
+                prefix = f"yt_{video_id}_"
+                [entry.name for entry in os.scandir(root) if entry.name.startswith(prefix)]
+
+    def walk():
+        sum(len(names) for _, _, names in os.walk(root))
+
+    return {
+        "lookup_us": timed(lookups, 3) * 1000 / samples,
+        "list_video_ms": timed(list_video, 1) / len(listing_videos),
+        "walk_ms": timed(walk, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=100_000)
+    parser.add_argument('--per-video', type=int, default=50)
+    parser.add_argument('--dir', type=Path, help='where to create the test stores')
+    args = parser.parse_args()
+
+    base = Path(tempfile.mkdtemp(prefix='store-layout-', dir=args.dir))
+    try:
+        results = {}
+        for layout, sharded in (('flat', False), ('sharded', True)):
+            root = base / layout
+            started = time.perf_counter()
+            videos = build(root, args.files, args.per_video, sharded)
+            print(f"built {layout} store with {len(videos) * args.per_video} files "
+                  f"in {time.perf_counter() - started:.1f}s")
+            results[layout] = run(root, videos, args.per_video, sharded)
+
+        print(f"\n{'layout':<10}{'lookup us':>12}{'list video ms':>16}{'full walk ms':>15}")
+        for layout, result in results.items():
+            print(f"{layout:<10}{result['lookup_us']:>12.1f}{result['list_video_ms']:>16.2f}{result['walk_ms']:>15.0f}")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,8 @@ module.exports = {
   apps : [{
     name: "youtube-notes-backend",
     script: "python",
-    args: "main.py",
+    // Not main.py: spawned encode workers would re-run it and rebuild the app
+    args: "-m uvicorn main:app --host 0.0.0.0 --port 8000",
     env: {
       PORT: "8000",
       NODE_ENV: "production"
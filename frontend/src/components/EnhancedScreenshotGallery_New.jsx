@@ -29,7 +29,8 @@ const EnhancedScreenshotGallery = ({
         timestamp: screenshot.timestamp,
         image_data: screenshot.image,
         transcript_context: screenshot.transcriptContext,
-        prompt: customPrompt
+        prompt: customPrompt,
+        regenerate: true
       });
 
       const updatedScreenshots = [...screenshots];
@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { getContentTypeIcon } from '../utils/iconUtils.jsx';
 import ReactMarkdown from 'react-markdown';
+import { screenshotImageUrl } from './screenshot/screenshotService';
 
 const ScreenshotCard = ({
   screenshot,
@@ -48,7 +49,7 @@ const ScreenshotCard = ({
     <div className={`bg-white rounded-lg shadow-md overflow-hidden print:shadow-none print:border-t print:border-gray-200 print:w-full print:max-w-none print:first:border-t-0 ${expanded ? 'col-span-2' : ''}`}>
       <div className="relative">
         <img 
-          src={screenshot.image} 
+          src={expanded ? screenshot.image : screenshotImageUrl(screenshot, 'preview')} 
           alt={`Screenshot ${index + 1}`}
           className={`w-full object-cover ${expanded ? 'max-h-[600px]' : 'max-h-[300px]'} print:object-contain print:max-h-[400px] print:w-auto print:mx-auto`}
           onClick={onToggleExpand}
@@ -54,7 +54,8 @@ const [editableCaptions, setEditableCaptions] = useState({});
         timestamp: screenshot.timestamp,
         image_data: screenshot.image,
         transcript_context: screenshot.transcriptContext,
-        prompt: customPrompt
+        prompt: customPrompt,
+        regenerate: true
       });
 
       const updatedScreenshots = [...screenshots];
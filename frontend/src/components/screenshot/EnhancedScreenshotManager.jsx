@@ -6,7 +6,14 @@ import BurstModeControls from './BurstModeControls';
 import MarkModeControls from './MarkModeControls';
 import CaptureControls from './CaptureControls';
 import LabelControls from './LabelControls';
-import { captureScreenshot, extractVideoId } from './screenshotService';
+import {
+  captureScreenshot,
+  captureBurstScreenshots,
+  buildScreenshotResult,
+  capturedImage,
+  extractVideoId,
+  generateStructuredCaptions
+} from './screenshotService';
 
 const EnhancedScreenshotManager = ({ 
   videoId, 
@@ -77,25 +84,68 @@ const EnhancedScreenshotManager = ({
       
       const screenshots = [];
       const startTime = player.getCurrentTime();
+      const timestamps = Array.from(
+        { length: burstCount },
+        (_, i) => startTime + (i * burstInterval)
+      );
       
-      for (let i = 0; i < burstCount; i++) {
-        const timestamp = startTime + (i * burstInterval);
+      // One batch request loads the video once on the backend for the whole burst
+      await captureBurstScreenshots({
+        videoId,
+        timestamps,
+        label: enableLabel ? {
+          text: labelText,
+          fontSize: fontSize
+        } : null,
+        onFrame: async (frame) => {
+          const screenshot = await buildScreenshotResult({
+            imageData: capturedImage(frame),
+            screenshotId: frame.screenshot_id,
+            timestamp: frame.timestamp,
+            generateCaption: false
+          });
+          screenshots.push(screenshot);
+        }
+      });
+      screenshots.sort((a, b) => a.timestamp - b.timestamp);
+
+      // Caption the whole burst in one batch request instead of one call per frame
+      if (processWithCaptions && screenshots.length > 0) {
+        let captionErrors = false;
+        const failed = {
+          caption: '❌ Caption generation failed - use regenerate option',
+          captionDisabled: false,
+          captionError: true
+        };
         try {
-          const screenshot = await captureScreenshot({
-            player,
-            videoId,
-            timestamp,
-            generateCaption: processWithCaptions,
+          await generateStructuredCaptions({
+            timestamps: screenshots.map(screenshot => screenshot.timestamp),
             transcript,
             customPrompt,
-            label: enableLabel ? {
-              text: labelText,
-              fontSize: fontSize
-            } : null
+            onCaption: async (result) => {
+              const screenshot = screenshots[result.index];
+              if (result.error) {
+                captionErrors = true;
+                Object.assign(screenshot, failed);
+                return;
+              }
+              Object.assign(screenshot, {
+                caption: result.structured_caption,
+                content_type: result.content_type,
+                transcriptContext: result.transcriptContext,
+                captionDisabled: false
+              });
+            }
           });
-          screenshots.push(screenshot);
         } catch (error) {
-          console.error(`Failed to capture burst screenshot ${i}:`, error);
+          console.warn('Batch captioning failed:', error);
+          captionErrors = true;
+          screenshots
+            .filter(screenshot => screenshot.captionDisabled)
+            .forEach(screenshot => Object.assign(screenshot, failed));
+        }
+        if (captionErrors) {
+          setError('Some captions failed to generate. You can regenerate them individually.');
         }
       }
       
@@ -1,12 +1,12 @@
 import React from 'react';
 import { useScreenshots } from './useScreenshots';
+import { screenshotImageUrl } from './screenshotService';
 
 const ScreenshotGallery = ({ initialScreenshots = [], onScreenshotEdit }) => {
   const {
     screenshots,
     currentPage,
     totalPages,
-    isLoading,
     addScreenshots,
     nextPage,
     previousPage,
@@ -55,7 +55,7 @@ const ScreenshotGallery = ({ initialScreenshots = [], onScreenshotEdit }) => {
           <div key={index} className="bg-white rounded-lg shadow-md overflow-hidden">
             <div className="relative aspect-video">
               <img
-                src={screenshot.image}
+                src={screenshotImageUrl(screenshot, 'preview')}
                 alt={`Screenshot ${index + 1}`}
                 className="w-full h-full object-cover"
                 loading="lazy"
@@ -92,11 +92,6 @@ const ScreenshotGallery = ({ initialScreenshots = [], onScreenshotEdit }) => {
           </div>
         ))}
       </div>
-      {isLoading && (
-        <div className="flex justify-center items-center mt-4">
-          <div className="animate-spin rounded-full h-8 w-8 border-b-2 border-gray-900"></div>
-        </div>
-      )}
       {renderPagination()}
     </div>
   );
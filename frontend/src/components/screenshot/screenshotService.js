@@ -11,6 +11,106 @@ export const extractVideoId = (url) => {
   return match ? match[1] : url;
 };
 
+// Capture responses reference the saved file by URL unless inline data was requested
+export const capturedImage = (data) =>
+  data.image_url ? `${API_BASE_URL}${data.image_url}` : data.image_data;
+
+// Smaller server-side copy of a saved screenshot for gallery views, falling
+// back to the full image for screenshots that were never saved on the server
+export const screenshotImageUrl = (screenshot, derivative) => {
+  if (!screenshot.screenshotId || !derivative) return screenshot.image;
+  if (screenshot.image && !screenshot.image.startsWith('data:')) {
+    // Keep the version token so the derivative is cached as long as the original
+    return `${screenshot.image}&derivative=${derivative}`;
+  }
+  return `${API_BASE_URL}/api/screenshots/${encodeURIComponent(screenshot.screenshotId)}?derivative=${derivative}`;
+};
+
+// Transcript lines within 20 seconds either side of a timestamp
+export const transcriptContext = (transcript, timestamp, contextWindow = 20) =>
+  transcript
+    .filter(entry =>
+      entry.start >= timestamp - contextWindow &&
+      entry.start <= timestamp + contextWindow
+    )
+    .map(entry => `[${formatTime(entry.start)}] ${entry.text}`)
+    .join('\n\n');
+
+export const buildScreenshotResult = async ({
+  imageData,
+  screenshotId,
+  timestamp,
+  generateCaption,
+  transcript,
+  customPrompt
+}) => {
+  // If captions are disabled, return just the screenshot with appropriate metadata
+  if (!generateCaption) {
+    return {
+      image: imageData,
+      screenshotId,
+      timestamp,
+      content_type: 'screenshot_only',
+      notes: '',
+      transcriptContext: '',
+      captionDisabled: true  // Add flag to indicate captions were intentionally disabled
+    };
+  }
+
+  // Set up caption generation with timeout
+  const captionPromise = new Promise(async (resolve, reject) => {
+    try {
+      // Get transcript context
+      const relevantTranscript = transcriptContext(transcript, timestamp);
+
+      const captionResponse = await axios.post(`${API_BASE_URL}/api/generate-structured-caption`, {
+        timestamp,
+        image_data: imageData,
+        transcript_context: relevantTranscript,
+        prompt: customPrompt
+      });
+
+      resolve({
+        caption: captionResponse.data.structured_caption,
+        content_type: captionResponse.data.content_type,
+        transcriptContext: relevantTranscript
+      });
+    } catch (error) {
+      reject(error);
+    }
+  });
+
+  // Set up timeout
+  const timeoutPromise = new Promise((resolve, reject) => {
+    setTimeout(() => {
+      reject(new Error('Caption generation timed out'));
+    }, 15000); // 15 second timeout
+  });
+
+  try {
+    const captionData = await Promise.race([captionPromise, timeoutPromise]);
+    return {
+      image: imageData,
+      screenshotId,
+      timestamp,
+      ...captionData,
+      notes: ''
+    };
+  } catch (error) {
+    console.warn(`Caption generation failed for timestamp ${timestamp}:`, error);
+    return {
+      image: imageData,
+      screenshotId,
+      timestamp,
+      caption: '❌ Caption generation failed - use regenerate option',
+      content_type: 'screenshot_only',
+      notes: '',
+      transcriptContext: '',
+      captionError: true
+    };
+  }
+};
+
 export const captureScreenshot = async ({
   player,
   videoId,
@@ -47,76 +147,15 @@ export const captureScreenshot = async ({
       throw error;
     }
 
-    // If captions are disabled, return just the screenshot with appropriate metadata
-    if (!generateCaption) {
-      return {
-        image: screenshotResponse.data.image_data,
-        timestamp,
-        content_type: 'screenshot_only',
-        notes: '',
-        transcriptContext: '',
-        captionDisabled: true  // Add flag to indicate captions were intentionally disabled
-      };
-    }
-
-    // Set up caption generation with timeout
-    const captionPromise = new Promise(async (resolve, reject) => {
-      try {
-        // Get transcript context
-        const contextWindow = 20;
-        const relevantTranscript = transcript
-          .filter(entry => 
-            entry.start >= timestamp - contextWindow &&
-            entry.start <= timestamp + contextWindow
-          )
-          .map(entry => `[${formatTime(entry.start)}] ${entry.text}`)
-          .join('\n\n');
-
-        const captionResponse = await axios.post(`${API_BASE_URL}/api/generate-structured-caption`, {
-          timestamp,
-          image_data: screenshotResponse.data.image_data,
-          transcript_context: relevantTranscript,
-          prompt: customPrompt
-        });
-
-        resolve({
-          caption: captionResponse.data.structured_caption,
-          content_type: captionResponse.data.content_type,
-          transcriptContext: relevantTranscript
-        });
-      } catch (error) {
-        reject(error);
-      }
-    });
-
-    // Set up timeout
-    const timeoutPromise = new Promise((resolve, reject) => {
-      setTimeout(() => {
-        reject(new Error('Caption generation timed out'));
-      }, 15000); // 15 second timeout
+    return await buildScreenshotResult({
+      imageData: capturedImage(screenshotResponse.data),
+      screenshotId: screenshotResponse.data.screenshot_id,
+      timestamp,
+      generateCaption,
+      transcript,
+      customPrompt
     });
 
-    try {
-      const captionData = await Promise.race([captionPromise, timeoutPromise]);
-      return {
-        image: screenshotResponse.data.image_data,
-        timestamp,
-        ...captionData,
-        notes: ''
-      };
-    } catch (error) {
-      console.warn(`Caption generation failed for timestamp ${timestamp}:`, error);
-      return {
-        image: screenshotResponse.data.image_data,
-        timestamp,
-        caption: '❌ Caption generation failed - use regenerate option',
-        content_type: 'screenshot_only',
-        notes: '',
-        transcriptContext: '',
-        captionError: true
-      };
-    }
-
   } finally {
   if (onPlayVideo) {
   try {
@@ -127,4 +166,85 @@ export const captureScreenshot = async ({
         }
       }
     }
-  };
\ No newline at end of file
+  };
+
+// Capture several frames from one backend page session. Frames are streamed
+// back as NDJSON and handed to onFrame as soon as each one is encoded.
+export const captureBurstScreenshots = async ({
+  videoId,
+  timestamps,
+  label,
+  onFrame
+}) => {
+  const response = await fetch(`${API_BASE_URL}/api/capture-screenshots/batch`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({
+      video_id: extractVideoId(videoId),
+      timestamps,
+      label
+    })
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Batch capture failed with status ${response.status}`);
+  }
+
+  await readNdjson(response, async (message) => {
+    if (message.error) {
+      console.error(`Failed to capture burst screenshot at ${message.timestamp}:`, message.error);
+      return;
+    }
+    await onFrame(message);
+  });
+};
+
+// Caption many screenshots in one request. The server bounds how many
+// Claude calls run at once and streams each caption back as it finishes.
+export const generateStructuredCaptions = async ({
+  timestamps,
+  transcript,
+  customPrompt,
+  onCaption
+}) => {
+  const items = timestamps.map(timestamp => ({
+    timestamp,
+    transcript_context: transcriptContext(transcript, timestamp)
+  }));
+  const response = await fetch(`${API_BASE_URL}/api/generate-structured-captions/batch`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ items, prompt: customPrompt })
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Batch captioning failed with status ${response.status}`);
+  }
+
+  await readNdjson(response, async (message) => {
+    await onCaption({ ...message, transcriptContext: items[message.index].transcript_context });
+  });
+};
+
+// Hand each line of an NDJSON response to onMessage, skipping the final summary
+const readNdjson = async (response, onMessage) => {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  const handleLine = async (line) => {
+    if (!line.trim()) return;
+    const message = JSON.parse(line);
+    if (message.done) return;
+    await onMessage(message);
+  };
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffered += decoder.decode(value, { stream: true });
+    const lines = buffered.split('\n');
+    buffered = lines.pop();
+    for (const line of lines) {
+      await handleLine(line);
+    }
+  }
+  await handleLine(buffered);
+};
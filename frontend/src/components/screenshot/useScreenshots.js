@@ -1,12 +1,10 @@
-import { useState, useEffect } from 'react';
-import { API_BASE_URL } from '../../config';
+import { useState } from 'react';
 
 const SCREENSHOTS_PER_PAGE = 12;
 
 export const useScreenshots = (initialScreenshots = []) => {
   const [screenshots, setScreenshots] = useState(initialScreenshots);
   const [currentPage, setCurrentPage] = useState(1);
-  const [isLoading, setIsLoading] = useState(false);
 
   // Calculate total pages
   const totalPages = Math.ceil(screenshots.length / SCREENSHOTS_PER_PAGE);
@@ -30,23 +28,6 @@ export const useScreenshots = (initialScreenshots = []) => {
     });
   };
 
-  // Clean up old screenshots
-  const cleanupScreenshots = async () => {
-    try {
-      setIsLoading(true);
-      const response = await fetch(`${API_BASE_URL}/api/cleanup-screenshots`, {
-        method: 'POST'
-      });
-      if (!response.ok) {
-        throw new Error('Failed to cleanup screenshots');
-      }
-    } catch (error) {
-      console.error('Screenshot cleanup failed:', error);
-    } finally {
-      setIsLoading(false);
-    }
-  };
-
   // Navigation functions
   const nextPage = () => {
     if (currentPage < totalPages) {
@@ -66,25 +47,10 @@ export const useScreenshots = (initialScreenshots = []) => {
     }
   };
 
-  // Run cleanup periodically
-  useEffect(() => {
-    const cleanup = async () => {
-      await cleanupScreenshots();
-    };
-    
-    // Run cleanup every 5 minutes
-    const interval = setInterval(cleanup, 5 * 60 * 1000);
-    
-    return () => {
-      clearInterval(interval);
-    };
-  }, []);
-
   return {
     screenshots: getCurrentPageScreenshots(),
     currentPage,
     totalPages,
-    isLoading,
     addScreenshots,
     nextPage,
     previousPage,
@@ -113,4 +113,49 @@ export const queryTranscript = async (transcript, prompt) => {
     console.error('Error querying transcript:', error);
     throw error;
   }
-};
\ No newline at end of file
+};
+
+/**
+ * Query transcript and receive the answer as it is generated
+ * @param {Array} transcript - Transcript array
+ * @param {string} prompt - Query prompt
+ * @param {Function} onDelta - Called with the text received so far
+ * @returns {Promise<Object>} - Final response, with token usage
+ */
+export const streamQueryTranscript = async (transcript, prompt, onDelta) => {
+  const response = await fetch(`${API_BASE_URL}/api/query-transcript/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ transcript, prompt })
+  });
+  if (!response.ok || !response.body) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.detail || `Server error: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  let text = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffered += decoder.decode(value, { stream: true });
+    // Events are separated by a blank line: "event: <name>\ndata: <json>"
+    const events = buffered.split('\n\n');
+    buffered = events.pop();
+    for (const raw of events) {
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+      if (event === 'delta') {
+        text += data.text;
+        onDelta(text);
+      } else if (event === 'done') {
+        return { response: data.text, usage: data.usage };
+      } else if (event === 'error') {
+        throw new Error(data.detail || 'Streaming failed');
+      }
+    }
+  }
+  throw new Error('Response ended before it was complete');
+};
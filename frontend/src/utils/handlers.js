@@ -1,4 +1,4 @@
-import { clearServerState, queryTranscript } from './apiUtils';
+import { clearServerState, queryTranscript, streamQueryTranscript } from './apiUtils';
 
 export const createScreenshotHandler = (setScreenshots) => (newScreenshots) => {
   setScreenshots(prev => {
@@ -24,25 +24,35 @@ export const createScreenshotHandler = (setScreenshots) => (newScreenshots) => {
 };
 
 export const createPromptSubmitHandler = (setScreenshots, setError, currentTime, transcript) => async (prompt) => {
+  const createdAt = new Date().toISOString();
+  const updateResponse = (response) => setScreenshots(prev => prev.map(screenshot =>
+    screenshot.type === 'prompt_response' && screenshot.createdAt === createdAt
+      ? { ...screenshot, response }
+      : screenshot
+  ));
+
   try {
-    const response = await queryTranscript(transcript, prompt);
+    // Show the answer as it streams in rather than after the whole reply
+    setScreenshots(prev => [...prev, {
+      timestamp: currentTime,
+      type: 'prompt_response',
+      prompt: prompt,
+      response: '',
+      createdAt
+    }]);
+    const response = await streamQueryTranscript(transcript, prompt, updateResponse);
     
     // Ensure we have a valid response
     if (!response || typeof response.response !== 'string') {
       throw new Error('Invalid response format from server');
     }
 
-    const newScreenshot = {
-      timestamp: currentTime,
-      type: 'prompt_response',
-      prompt: prompt,
-      response: response.response, // Use response directly from the response object
-      createdAt: new Date().toISOString()
-    };
-
-    setScreenshots(prev => [...prev, newScreenshot]);
+    updateResponse(response.response);
     return true;
   } catch (error) {
+    setScreenshots(prev => prev.filter(screenshot =>
+      !(screenshot.type === 'prompt_response' && screenshot.createdAt === createdAt)
+    ));
     console.error('Error submitting prompt:', error);
     const errorMessage = error.response?.data?.detail || 
                         error.response?.data?.error ||
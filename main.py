@@ -2,13 +2,34 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
+from contextlib import asynccontextmanager
 import logging
 
-from modules.config import logger, STATIC_DIR
+from modules.config import (
+    logger, STATIC_DIR, browser_pool, embed_page_cache, screenshot_manager, retention_scheduler,
+    storage_writer, llm_client
+)
 from modules.routes import router
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up the capture browser so the first screenshot doesn't pay for a cold start
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        logger.error(f"Browser pool failed to start, will retry on first capture: {str(e)}")
+    await embed_page_cache.start()
+    await retention_scheduler.start()
+    yield
+    await retention_scheduler.stop()
+    await embed_page_cache.stop()
+    await browser_pool.stop()
+    await storage_writer.flush()
+    await llm_client.close()
+    screenshot_manager.shutdown()
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
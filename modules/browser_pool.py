@@ -0,0 +1,209 @@
+from contextlib import asynccontextmanager
+from typing import Optional
+from playwright.async_api import async_playwright
+import asyncio
+import logging
+
+from modules import resource_blocking
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+class _PageSlot:
+    """A pre-warmed browser context with a single open page"""
+
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.uses = 0
+
+    def is_healthy(self) -> bool:
+        return not self.page.is_closed()
+
+    async def close(self):
+        try:
+            await self.context.close()
+        except Exception as e:
+            logger.warning(f"Error closing browser context: {str(e)}")
+
+
+class BrowserPool:
+    """Long-lived Chromium instance with a pool of pre-warmed pages.
+
+    Pages are handed out through the ``page()`` context manager and recycled
+    after ``max_page_uses`` captures or after an error. The browser itself is
+    relaunched after ``max_browser_uses`` captures or when it disconnects.
+    """
+
+    def __init__(self, size: int = 2, max_page_uses: int = 50,
+                 max_browser_uses: int = 500, launch_args: Optional[list] = None,
+                 user_agent: str = DEFAULT_USER_AGENT,
+                 viewport: Optional[dict] = None, blocking_profile: str = 'off'):
+        self.size = max(1, size)
+        self.max_page_uses = max_page_uses
+        self.max_browser_uses = max_browser_uses
+        self.launch_args = launch_args or ['--disable-dev-shm-usage', '--mute-audio']
+        self.user_agent = user_agent
+        self.viewport = viewport or {'width': 1280, 'height': 720}
+        self.blocking_profile = blocking_profile
+
+        self._playwright = None
+        self._browser = None
+        self._browser_uses = 0
+        self._in_use = 0
+        self._idle: Optional[asyncio.Queue] = None
+        # Created on first use so it binds to the server's event loop (Python 3.9)
+        self._lock_instance: Optional[asyncio.Lock] = None
+        self._started = False
+
+    @property
+    def _lock(self) -> asyncio.Lock:
+        if self._lock_instance is None:
+            self._lock_instance = asyncio.Lock()
+        return self._lock_instance
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    async def start(self):
+        """Launch the browser and pre-warm the page pool"""
+        async with self._lock:
+            if self._started:
+                return
+            self._playwright = await async_playwright().start()
+            try:
+                await self._launch_browser()
+                self._idle = asyncio.Queue()
+                for _ in range(self.size):
+                    self._idle.put_nowait(await self._new_slot())
+            except Exception:
+                await self._close_browser()
+                await self._playwright.stop()
+                self._playwright = None
+                raise
+            self._started = True
+            logger.info(f"Browser pool started with {self.size} pre-warmed pages")
+
+    async def stop(self):
+        """Close all pooled pages, the browser and the Playwright driver"""
+        async with self._lock:
+            if not self._started:
+                return
+            self._started = False
+            while not self._idle.empty():
+                await self._idle.get_nowait().close()
+            await self._close_browser()
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
+            logger.info("Browser pool stopped")
+
+    async def _launch_browser(self):
+        self._browser = await self._playwright.chromium.launch(args=self.launch_args)
+        self._browser_uses = 0
+
+    async def _close_browser(self):
+        if self._browser:
+            try:
+                await self._browser.close()
+            except Exception as e:
+                logger.warning(f"Error closing browser: {str(e)}")
+            self._browser = None
+
+    async def _new_slot(self) -> _PageSlot:
+        context = await self._browser.new_context(
+            user_agent=self.user_agent,
+            viewport=self.viewport
+        )
+        page = await context.new_page()
+        await resource_blocking.install(page, self.blocking_profile)
+        return _PageSlot(context, page)
+
+    async def _ensure_browser(self):
+        """Relaunch the browser if it crashed or has served too many captures"""
+        async with self._lock:
+            healthy = self._browser is not None and self._browser.is_connected()
+            # A worn but healthy browser is only recycled once no page is in use
+            if healthy and (self._browser_uses < self.max_browser_uses or self._in_use):
+                return
+            reason = "disconnected" if not healthy else f"reached {self._browser_uses} uses"
+            logger.info(f"Recycling browser ({reason})")
+            await self._close_browser()
+            await self._launch_browser()
+
+    async def _checkout(self) -> _PageSlot:
+        if not self._started:
+            await self.start()
+        slot = await self._idle.get()
+        try:
+            await self._ensure_browser()
+            if slot.context.browser is not self._browser or not slot.is_healthy() \
+                    or slot.uses >= self.max_page_uses:
+                await slot.close()
+                slot = await self._new_slot()
+        except Exception:
+            # Keep the pool at full size even if recycling failed
+            self._idle.put_nowait(slot)
+            raise
+        slot.uses += 1
+        self._browser_uses += 1
+        self._in_use += 1
+        return slot
+
+    async def _checkin(self, slot: _PageSlot, failed: bool):
+        self._in_use -= 1
+        if failed or not self._started:
+            await slot.close()
+            if not self._started:
+                return
+            try:
+                slot = await self._new_slot()
+            except Exception as e:
+                # The next checkout will notice the closed page and rebuild it
+                logger.error(f"Failed to replace browser page: {str(e)}")
+        self._idle.put_nowait(slot)
+
+    @asynccontextmanager
+    async def page(self):
+        """Borrow a warm page; it is recycled if the caller raises"""
+        slot = await self._checkout()
+        failed = False
+        try:
+            yield slot.page
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            await self._checkin(slot, failed)
+
+    async def new_slot(self) -> _PageSlot:
+        """Open a page outside the pool, e.g. for callers that keep pages alive"""
+        if not self._started:
+            await self.start()
+        await self._ensure_browser()
+        return await self._new_slot()
+
+    def owns(self, slot: _PageSlot) -> bool:
+        """Whether a slot's page is open on the current browser"""
+        return slot.context.browser is self._browser and slot.is_healthy()
+
+    def mark_busy(self, busy: bool):
+        """Count an externally held page as in use so the browser isn't recycled under it"""
+        if busy:
+            self._in_use += 1
+            self._browser_uses += 1
+        else:
+            self._in_use -= 1
+
+    def stats(self) -> dict:
+        return {
+            "started": self._started,
+            "size": self.size,
+            "idle_pages": self._idle.qsize() if self._idle else 0,
+            "pages_in_use": self._in_use,
+            "browser_connected": bool(self._browser and self._browser.is_connected()),
+            "browser_uses": self._browser_uses,
+        }
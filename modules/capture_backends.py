@@ -0,0 +1,181 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+from PIL import Image
+import asyncio
+import logging
+import time
+
+import cv2
+import yt_dlp
+
+from modules import resource_blocking
+from modules.capture_retry import is_terminal
+from modules.embed_capture import (
+    load_embed, seek_and_grab, StageTimer, EncodedFrame, DEFAULT_FRAME_READY_TIMEOUT_MS
+)
+
+logger = logging.getLogger(__name__)
+
+# A captured frame is encoded image bytes to be re-encoded, an already decoded
+# image, or bytes already in the stored format that can be written as-is
+Frame = Union[bytes, Image.Image, EncodedFrame]
+
+
+class CaptureBackend(ABC):
+    """Grabs a single frame of a YouTube video at a timestamp.
+
+    ``grab_mode`` selects how browser backends read the frame (see
+    embed_capture.GRAB_MODES); backends that decode frames themselves ignore it.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def capture(self, video_id: str, timestamp: float, timer: StageTimer,
+                      grab_mode: Optional[str] = None) -> Frame:
+        ...
+
+
+class PlaywrightBackend(CaptureBackend):
+    """Screenshots the YouTube embed player in a pooled headless Chromium page"""
+
+    name = "playwright"
+
+    def __init__(self, browser_pool, ready_timeout_ms: int = DEFAULT_FRAME_READY_TIMEOUT_MS,
+                 page_cache=None, grab_mode: str = 'direct'):
+        self.browser_pool = browser_pool
+        self.ready_timeout_ms = ready_timeout_ms
+        self.page_cache = page_cache
+        self.grab_mode = grab_mode
+
+    async def capture(self, video_id: str, timestamp: float, timer: StageTimer,
+                      grab_mode: Optional[str] = None) -> Frame:
+        grab_mode = grab_mode or self.grab_mode
+        acquire_started = time.perf_counter()
+        if self.page_cache and self.page_cache.enabled:
+            # Pages with this video already loaded only need a seek and a grab
+            async with self.page_cache.page(video_id, timestamp, timer) as page:
+                timer.record('acquire_page', acquire_started)
+                # Navigation on a cache miss happened before this point, so it isn't counted
+                before = resource_blocking.page_snapshot(page)
+                frame = await seek_and_grab(page, timestamp, timer, self.ready_timeout_ms, grab_mode)
+                self._record_network(page, before, timer)
+                return frame
+
+        async with self.browser_pool.page() as page:
+            timer.record('acquire_page', acquire_started)
+            before = resource_blocking.page_snapshot(page)
+            await load_embed(page, video_id, timestamp, timer)
+            frame = await seek_and_grab(page, timestamp, timer, self.ready_timeout_ms, grab_mode)
+            self._record_network(page, before, timer)
+            return frame
+
+    @staticmethod
+    def _record_network(page, before: Optional[dict], timer: StageTimer):
+        network = resource_blocking.snapshot_delta(before, resource_blocking.page_snapshot(page))
+        if network is not None:
+            timer.counters['network'] = network
+
+
+class OpenCVBackend(CaptureBackend):
+    """Decodes the frame directly from a cached video file or resolved stream URL.
+
+    Seeking lands on the nearest keyframe and decodes forward, which is far
+    cheaper than rendering the player. Decoding runs in a thread pool because
+    OpenCV releases the GIL, so concurrent captures spread across cores.
+    """
+
+    name = "opencv"
+    STREAM_URL_TTL = 60 * 60  # Resolved googlevideo URLs expire after a few hours
+    STREAM_FORMAT = 'best[height<=720][vcodec!=none]/bestvideo[height<=720]'
+
+    def __init__(self, cache_dir: Path, max_workers: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="opencv-capture")
+        self._stream_urls: Dict[str, Tuple[str, float]] = {}
+
+    def _cached_file(self, video_id: str) -> Optional[Path]:
+        for path in self.cache_dir.glob(f"{video_id}.*"):
+            if path.is_file() and not path.name.endswith('.part'):
+                return path
+        return None
+
+    def _resolve_stream_url(self, video_id: str) -> str:
+        cached = self._stream_urls.get(video_id)
+        if cached and time.time() - cached[1] < self.STREAM_URL_TTL:
+            return cached[0]
+
+        ydl_opts = {'format': self.STREAM_FORMAT, 'quiet': True, 'no_warnings': True}
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
+        url = info.get('url')
+        if not url:
+            raise RuntimeError(f"Could not resolve a video stream for {video_id}")
+        self._stream_urls[video_id] = (url, time.time())
+        return url
+
+    def _decode_frame(self, source: str, timestamp: float) -> Image.Image:
+        capture = cv2.VideoCapture(source)
+        try:
+            if not capture.isOpened():
+                raise RuntimeError("Could not open video source for decoding")
+            capture.set(cv2.CAP_PROP_POS_MSEC, timestamp * 1000)
+            ok, frame = capture.read()
+            if not ok or frame is None:
+                raise RuntimeError(f"Could not decode a frame at {timestamp}s")
+            return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        finally:
+            capture.release()
+
+    async def capture(self, video_id: str, timestamp: float, timer: StageTimer,
+                      grab_mode: Optional[str] = None) -> Frame:
+        loop = asyncio.get_running_loop()
+        with timer.stage('resolve_source'):
+            cached_file = self._cached_file(video_id)
+            if cached_file:
+                source = str(cached_file)
+            else:
+                source = await loop.run_in_executor(self._executor, self._resolve_stream_url, video_id)
+        with timer.stage('decode'):
+            try:
+                return await loop.run_in_executor(self._executor, self._decode_frame, source, timestamp)
+            except Exception:
+                # The stream URL may have expired; resolve it again next time
+                self._stream_urls.pop(video_id, None)
+                raise
+
+
+class FrameCapturer:
+    """Dispatches captures to a named backend, falling back to another on failure"""
+
+    def __init__(self, backends: Dict[str, CaptureBackend], default: str, fallback: Optional[str] = None):
+        if default not in backends:
+            raise ValueError(f"Unknown default capture backend: {default}")
+        self.backends = backends
+        self.default = default
+        self.fallback = fallback
+
+    def get(self, name: Optional[str] = None) -> CaptureBackend:
+        name = name or self.default
+        if name not in self.backends:
+            raise KeyError(name)
+        return self.backends[name]
+
+    async def capture(self, video_id: str, timestamp: float, backend: Optional[str] = None,
+                      timer: Optional[StageTimer] = None,
+                      grab_mode: Optional[str] = None) -> Tuple[Frame, str]:
+        """Capture a frame, returning it together with the name of the backend used"""
+        timer = timer or StageTimer()
+        primary = self.get(backend)
+        try:
+            return await primary.capture(video_id, timestamp, timer, grab_mode), primary.name
+        except Exception as e:
+            # No backend can capture a video that is unavailable or embed-disabled
+            if not self.fallback or self.fallback == primary.name or is_terminal(e):
+                raise
+            logger.warning(f"{primary.name} capture failed, falling back to {self.fallback}: {str(e)}")
+            secondary = self.get(self.fallback)
+            return await secondary.capture(video_id, timestamp, timer, grab_mode), secondary.name
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+from typing import Optional
+from fastapi import HTTPException
+import logging
+import math
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Messages YouTube, the embed player or yt-dlp use for videos that will never
+# capture no matter how often we retry
+TERMINAL_ERROR_PATTERNS = (
+    'video unavailable',
+    'this video is unavailable',
+    'this video is private',
+    'private video',
+    'has been removed',
+    'playback on other websites has been disabled',
+    'embedding disabled',
+    'not made this video available in your country',
+    'sign in to confirm your age',
+    'copyright claim',
+    'unsupported url',
+)
+
+
+class TerminalCaptureError(Exception):
+    """A capture failure that retrying cannot fix, e.g. an unavailable video"""
+
+
+def is_terminal(error: Exception) -> bool:
+    """Classify a capture failure as terminal (don't retry) or retryable"""
+    if isinstance(error, TerminalCaptureError):
+        return True
+    if isinstance(error, HTTPException):
+        # Our own validation errors; 429 means "later", not "never"
+        return 400 <= error.status_code < 500 and error.status_code != 429
+    message = str(error).lower()
+    return any(pattern in message for pattern in TERMINAL_ERROR_PATTERNS)
+
+
+class CircuitBreaker:
+    """Opens after repeated failures; after a cool-down captures are let through
+    again and the first failure re-opens it"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.terminal = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def retry_after(self) -> int:
+        if self.opened_at is None:
+            return 0
+        return max(1, math.ceil(self.reset_timeout - (time.monotonic() - self.opened_at)))
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.is_open:
+            return False
+        # Half-open: the next attempt is the trial; a failure re-opens at once
+        self.opened_at = None
+        self.failures = self.failure_threshold - 1
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.terminal = False
+
+    def record_failure(self, error: Exception, terminal: bool = False):
+        self.failures += 1
+        self.last_error = str(error)
+        self.terminal = terminal
+        if terminal or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class CaptureRetryPolicy:
+    """Retry, backoff and circuit breaking for screenshot captures.
+
+    Terminal errors fail immediately and open the video's breaker so repeat
+    requests are answered without a capture slot. Retryable errors back off
+    exponentially with jitter. A per-video breaker opens after
+    ``video_failure_threshold`` failed captures and a global one after
+    ``global_failure_threshold`` consecutive failures across all videos.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.25, max_delay: float = 4.0,
+                 video_failure_threshold: int = 3, global_failure_threshold: int = 10,
+                 reset_timeout: float = 60, max_tracked_videos: int = 1000):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.video_failure_threshold = video_failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_tracked_videos = max_tracked_videos
+        self.global_breaker = CircuitBreaker(global_failure_threshold, reset_timeout)
+        self._video_breakers: "OrderedDict[str, CircuitBreaker]" = OrderedDict()
+        self.short_circuited = 0
+
+    def _breaker_for(self, video_id: str) -> CircuitBreaker:
+        breaker = self._video_breakers.get(video_id)
+        if breaker is None:
+            breaker = CircuitBreaker(self.video_failure_threshold, self.reset_timeout)
+            self._video_breakers[video_id] = breaker
+            while len(self._video_breakers) > self.max_tracked_videos:
+                self._video_breakers.popitem(last=False)
+        self._video_breakers.move_to_end(video_id)
+        return breaker
+
+    def check(self, video_id: str):
+        """Raise right away if a breaker for this capture is open"""
+        video_breaker = self._breaker_for(video_id)
+        if not video_breaker.allow():
+            self.short_circuited += 1
+            raise HTTPException(
+                status_code=422 if video_breaker.terminal else 503,
+                detail=f"Capture for {video_id} is failing, not retrying yet: {video_breaker.last_error}",
+                headers={"Retry-After": str(video_breaker.retry_after())}
+            )
+        if not self.global_breaker.allow():
+            self.short_circuited += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f"Screenshot capture is temporarily unavailable: {self.global_breaker.last_error}",
+                headers={"Retry-After": str(self.global_breaker.retry_after())}
+            )
+
+    def delay(self, attempt: int) -> float:
+        """Exponential backoff with equal jitter for the given (1-based) attempt"""
+        capped = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return capped / 2 + random.uniform(0, capped / 2)
+
+    def record_success(self, video_id: str):
+        self._breaker_for(video_id).record_success()
+        self.global_breaker.record_success()
+
+    def record_failure(self, video_id: str, error: Exception, terminal: bool):
+        self._breaker_for(video_id).record_failure(error, terminal)
+        if not terminal:
+            # A bad video says nothing about the health of the capture stack
+            self.global_breaker.record_failure(error)
+        logger.warning(f"Capture of {video_id} failed ({'terminal' if terminal else 'retryable'}): {str(error)}")
+
+    def stats(self) -> dict:
+        return {
+            "global_open": self.global_breaker.is_open,
+            "global_failures": self.global_breaker.failures,
+            "open_videos": [video_id for video_id, breaker in self._video_breakers.items() if breaker.is_open],
+            "short_circuited": self.short_circuited,
+        }
@@ -0,0 +1,127 @@
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+import asyncio
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureScheduler:
+    """Admission control for screenshot captures.
+
+    At most ``max_concurrent`` captures run at once. Further requests wait in
+    per-client queues that are served round-robin, so one client's burst
+    can't starve everyone else. When the shared queue (or a client's share
+    of it) is full the request is rejected with 429 and a Retry-After hint
+    derived from recent capture durations.
+    """
+
+    def __init__(self, max_concurrent: int = 2, max_queue: int = 16,
+                 max_queue_per_client: int = 8, sample_size: int = 200):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self._active = 0
+        self._queued = 0
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._wait_times = deque(maxlen=sample_size)
+        self._service_times = deque(maxlen=sample_size)
+        self.admitted = 0
+        self.rejected = 0
+
+    def _retry_after(self) -> int:
+        average_service = (sum(self._service_times) / len(self._service_times)
+                           if self._service_times else 2.0)
+        backlog = (self._queued + 1) / self.max_concurrent
+        return max(1, math.ceil(average_service * backlog))
+
+    def check_admission(self, client_id: str):
+        """Raise 429 if a new request from client_id would have to be rejected"""
+        if self._active < self.max_concurrent and self._queued == 0:
+            return
+        client_queue = self._queues.get(client_id)
+        client_depth = len(client_queue) if client_queue else 0
+        if self._queued >= self.max_queue or client_depth >= self.max_queue_per_client:
+            self.rejected += 1
+            retry_after = self._retry_after()
+            logger.warning(f"Capture queue saturated, rejecting {client_id} (retry in {retry_after}s)")
+            raise HTTPException(
+                status_code=429,
+                detail="Too many screenshot captures in progress, please retry shortly",
+                headers={"Retry-After": str(retry_after)}
+            )
+
+    def _dispatch(self):
+        """Hand free capacity to waiting clients in round-robin order"""
+        while self._active < self.max_concurrent and self._queues:
+            client_id, client_queue = next(iter(self._queues.items()))
+            waiter = client_queue.popleft()
+            self._queued -= 1
+            if client_queue:
+                self._queues.move_to_end(client_id)
+            else:
+                del self._queues[client_id]
+            if waiter.done():
+                continue
+            self._active += 1
+            waiter.set_result(None)
+
+    async def _acquire(self, client_id: str):
+        self.check_admission(client_id)
+        if self._active < self.max_concurrent and self._queued == 0:
+            self._active += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client_id, deque()).append(waiter)
+        self._queued += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Capacity was granted just as the caller went away
+                self._release()
+            else:
+                client_queue = self._queues.get(client_id)
+                if client_queue and waiter in client_queue:
+                    client_queue.remove(waiter)
+                    self._queued -= 1
+                    if not client_queue:
+                        del self._queues[client_id]
+            raise
+
+    def _release(self):
+        self._active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, client_id: str):
+        """Hold one capture slot for the duration of the block"""
+        queued_at = time.monotonic()
+        await self._acquire(client_id)
+        started_at = time.monotonic()
+        self.admitted += 1
+        self._wait_times.append(started_at - queued_at)
+        try:
+            yield
+        finally:
+            self._service_times.append(time.monotonic() - started_at)
+            self._release()
+
+    def stats(self) -> dict:
+        waits = sorted(self._wait_times)
+        return {
+            "max_concurrent": self.max_concurrent,
+            "active": self._active,
+            "queue_depth": self._queued,
+            "queue_depth_by_client": {client: len(queue) for client, queue in self._queues.items()},
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_ms_avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0,
+            "wait_ms_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0,
+            "service_ms_avg": round(sum(self._service_times) / len(self._service_times) * 1000, 1)
+            if self._service_times else 0,
+        }
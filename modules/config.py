@@ -1,11 +1,20 @@
 from pathlib import Path
 import os
 from dotenv import load_dotenv
-from anthropic import Anthropic
 from googleapiclient.discovery import build
 from modules.gif_capture import GifCapture
 from modules.content_saver import ContentSaver
 from modules.screenshot_manager import ScreenshotManager
+from modules.retention import RetentionScheduler
+from modules.storage_writer import StorageWriter
+from modules.llm_client import LLMClient
+from modules.llm_cache import LLMResponseCache
+from modules.browser_pool import BrowserPool
+from modules.embed_page_cache import EmbedPageCache
+from modules.single_flight import SingleFlight
+from modules.capture_scheduler import CaptureScheduler
+from modules.capture_retry import CaptureRetryPolicy
+from modules.capture_backends import FrameCapturer, PlaywrightBackend, OpenCVBackend
 import logging
 
 # Load environment variables
@@ -23,21 +32,155 @@ SCREENSHOTS_DIR.mkdir(exist_ok=True)
 STATIC_DIR = Path(__file__).parent.parent / "static"
 
 # Initialize components
-anthropic_client = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
 gif_capture = GifCapture()
-content_saver = ContentSaver(DATA_DIR)
-screenshot_manager = ScreenshotManager(DATA_DIR)
+# Files are written to a temp file and renamed into place; fsync makes that crash-safe
+STORAGE_FSYNC = os.getenv('STORAGE_FSYNC', 'true').lower() == 'true'
+storage_writer = StorageWriter(fsync=STORAGE_FSYNC)
+# Claude calls share one pooled async client; each call times out on its own
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '60'))
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+# Replies are cached by (model, max_tokens, prompt) in memory and under DATA_DIR/llm_cache
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', '256'))
+LLM_CACHE_TTL_HOURS = float(os.getenv('LLM_CACHE_TTL_HOURS', '168'))
+LLM_CACHE_MAX_MB = int(os.getenv('LLM_CACHE_MAX_MB', '64'))
+llm_cache = LLMResponseCache(
+    DATA_DIR / 'llm_cache',
+    memory_entries=LLM_CACHE_MEMORY_ENTRIES,
+    ttl_seconds=LLM_CACHE_TTL_HOURS * 3600,
+    max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024,
+    storage_writer=storage_writer
+)
+# Point at tools/stub_anthropic_server.py to run without an API key
+ANTHROPIC_BASE_URL = os.getenv('ANTHROPIC_BASE_URL') or None
+llm_client = LLMClient(
+    os.getenv('ANTHROPIC_API_KEY'),
+    base_url=ANTHROPIC_BASE_URL,
+    timeout=LLM_TIMEOUT_SECONDS,
+    max_connections=LLM_MAX_CONNECTIONS,
+    cache=llm_cache
+)
+content_saver = ContentSaver(DATA_DIR, storage_writer)
+
+# Screenshot encoding runs in a 'thread' or 'process' pool with a bounded queue.
+# Process workers are spawned and re-import the launching script, so only use
+# 'process' when the server is started as `uvicorn main:app` (see ecosystem.config.js)
+ENCODE_EXECUTOR = os.getenv('ENCODE_EXECUTOR', 'thread')
+ENCODE_WORKERS = int(os.getenv('ENCODE_WORKERS', str(os.cpu_count() or 2)))
+ENCODE_QUEUE_SIZE = int(os.getenv('ENCODE_QUEUE_SIZE', '32'))
+# TrueType font for screenshot labels; common Linux and macOS fonts are tried after it
+LABEL_FONT_PATH = os.getenv('LABEL_FONT_PATH')
+LABEL_OVERLAY_CACHE_SIZE = int(os.getenv('LABEL_OVERLAY_CACHE_SIZE', '64'))
+# fast-preview, balanced, archival or jpeg; requests can pick their own
+SCREENSHOT_ENCODING_PROFILE = os.getenv('SCREENSHOT_ENCODING_PROFILE', 'balanced')
+# Retention limits for the screenshot store, applied by a background task
+MAX_SCREENSHOT_AGE_DAYS = int(os.getenv('MAX_SCREENSHOT_AGE_DAYS', '7'))
+MAX_SCREENSHOTS_PER_VIDEO = int(os.getenv('MAX_SCREENSHOTS_PER_VIDEO', '50'))
+# Least recently accessed files are evicted above this size; 0 disables the quota
+SCREENSHOT_STORE_MAX_MB = int(os.getenv('SCREENSHOT_STORE_MAX_MB', '0'))
+RETENTION_INTERVAL_SECONDS = int(os.getenv('RETENTION_INTERVAL_SECONDS', '900'))
+# Perceptual hash (dhash or phash) and the Hamming distance at which frames count as duplicates
+FRAME_HASH_ALGORITHM = os.getenv('FRAME_HASH_ALGORITHM', 'dhash')
+DEDUP_MAX_DISTANCE = int(os.getenv('DEDUP_MAX_DISTANCE', '6'))
+screenshot_manager = ScreenshotManager(
+    DATA_DIR,
+    max_age_days=MAX_SCREENSHOT_AGE_DAYS,
+    max_per_video=MAX_SCREENSHOTS_PER_VIDEO,
+    max_bytes=SCREENSHOT_STORE_MAX_MB * 1024 * 1024,
+    encode_executor=ENCODE_EXECUTOR,
+    encode_workers=ENCODE_WORKERS,
+    encode_queue_size=ENCODE_QUEUE_SIZE,
+    label_font_path=LABEL_FONT_PATH,
+    label_cache_size=LABEL_OVERLAY_CACHE_SIZE,
+    encoding_profile=SCREENSHOT_ENCODING_PROFILE,
+    frame_hash=FRAME_HASH_ALGORITHM,
+    storage_writer=storage_writer
+)
+retention_scheduler = RetentionScheduler(screenshot_manager, interval_seconds=RETENTION_INTERVAL_SECONDS)
+
+# Headless browser pool used for screenshot capture
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '2'))
+BROWSER_MAX_PAGE_USES = int(os.getenv('BROWSER_MAX_PAGE_USES', '50'))
+BROWSER_MAX_USES = int(os.getenv('BROWSER_MAX_USES', '500'))
+# Request interception profile for capture pages: 'off', 'trackers' or 'standard'
+CAPTURE_BLOCKING_PROFILE = os.getenv('CAPTURE_BLOCKING_PROFILE', 'standard')
+browser_pool = BrowserPool(
+    size=BROWSER_POOL_SIZE,
+    max_page_uses=BROWSER_MAX_PAGE_USES,
+    max_browser_uses=BROWSER_MAX_USES,
+    blocking_profile=CAPTURE_BLOCKING_PROFILE
+)
+FRAME_READY_TIMEOUT_MS = int(os.getenv('FRAME_READY_TIMEOUT_MS', '5000'))
+# Retries back off exponentially from CAPTURE_RETRY_DELAY up to CAPTURE_RETRY_MAX_DELAY
+CAPTURE_MAX_ATTEMPTS = int(os.getenv('CAPTURE_MAX_ATTEMPTS', '3'))
+CAPTURE_RETRY_DELAY = float(os.getenv('CAPTURE_RETRY_DELAY', '0.25'))
+CAPTURE_RETRY_MAX_DELAY = float(os.getenv('CAPTURE_RETRY_MAX_DELAY', '4'))
+CIRCUIT_VIDEO_FAILURES = int(os.getenv('CIRCUIT_VIDEO_FAILURES', '3'))
+CIRCUIT_GLOBAL_FAILURES = int(os.getenv('CIRCUIT_GLOBAL_FAILURES', '10'))
+CIRCUIT_RESET_SECONDS = int(os.getenv('CIRCUIT_RESET_SECONDS', '60'))
+capture_retry_policy = CaptureRetryPolicy(
+    max_attempts=CAPTURE_MAX_ATTEMPTS,
+    base_delay=CAPTURE_RETRY_DELAY,
+    max_delay=CAPTURE_RETRY_MAX_DELAY,
+    video_failure_threshold=CIRCUIT_VIDEO_FAILURES,
+    global_failure_threshold=CIRCUIT_GLOBAL_FAILURES,
+    reset_timeout=CIRCUIT_RESET_SECONDS
+)
+# 'direct' grabs the video element as WEBP via CDP; 'png' screenshots the page
+CAPTURE_GRAB_MODE = os.getenv('CAPTURE_GRAB_MODE', 'direct')
+
+# Open embed pages kept per video so repeat captures skip navigation (0 disables)
+EMBED_PAGE_CACHE_SIZE = int(os.getenv('EMBED_PAGE_CACHE_SIZE', '4'))
+EMBED_PAGE_CACHE_MEMORY_MB = int(os.getenv('EMBED_PAGE_CACHE_MEMORY_MB', '512'))
+EMBED_PAGE_CACHE_IDLE_SECONDS = int(os.getenv('EMBED_PAGE_CACHE_IDLE_SECONDS', '300'))
+embed_page_cache = EmbedPageCache(
+    browser_pool,
+    max_pages=EMBED_PAGE_CACHE_SIZE,
+    max_memory_mb=EMBED_PAGE_CACHE_MEMORY_MB,
+    idle_seconds=EMBED_PAGE_CACHE_IDLE_SECONDS
+)
+
+# Frame capture backends; the browser is always kept as the fallback
+CAPTURE_BACKEND = os.getenv('CAPTURE_BACKEND', 'playwright')
+VIDEO_CACHE_DIR = DATA_DIR / 'video_cache'
+OPENCV_CAPTURE_WORKERS = int(os.getenv('OPENCV_CAPTURE_WORKERS', str(os.cpu_count() or 2)))
+frame_capturer = FrameCapturer(
+    backends={
+        PlaywrightBackend.name: PlaywrightBackend(
+            browser_pool, FRAME_READY_TIMEOUT_MS, embed_page_cache, CAPTURE_GRAB_MODE
+        ),
+        OpenCVBackend.name: OpenCVBackend(VIDEO_CACHE_DIR, OPENCV_CAPTURE_WORKERS),
+    },
+    default=CAPTURE_BACKEND,
+    fallback=PlaywrightBackend.name
+)
+
+# Identical concurrent captures share one capture; idempotent retries replay the response
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '600'))
+capture_flights = SingleFlight()
+idempotent_captures = SingleFlight(result_ttl=IDEMPOTENCY_TTL_SECONDS)
+
+# Admission control: bounded concurrent captures with a fair, bounded wait queue
+CAPTURE_MAX_CONCURRENCY = int(os.getenv('CAPTURE_MAX_CONCURRENCY', str(BROWSER_POOL_SIZE)))
+CAPTURE_MAX_QUEUE = int(os.getenv('CAPTURE_MAX_QUEUE', '16'))
+CAPTURE_MAX_QUEUE_PER_CLIENT = int(os.getenv('CAPTURE_MAX_QUEUE_PER_CLIENT', '8'))
+capture_scheduler = CaptureScheduler(
+    max_concurrent=CAPTURE_MAX_CONCURRENCY,
+    max_queue=CAPTURE_MAX_QUEUE,
+    max_queue_per_client=CAPTURE_MAX_QUEUE_PER_CLIENT
+)
+
+BATCH_CAPTURE_MAX_TABS = int(os.getenv('BATCH_CAPTURE_MAX_TABS', '2'))
+BATCH_CAPTURE_MAX_FRAMES = int(os.getenv('BATCH_CAPTURE_MAX_FRAMES', '50'))
 
 # YouTube API setup
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
 youtube_client = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
 
-# Constants
-MAX_SCREENSHOT_AGE_DAYS = 7
-MAX_SCREENSHOTS_PER_VIDEO = 50
-
 # Model configuration
 CLAUDE_MODEL = "claude-3-haiku-20240307"
 CLAUDE_SONNET_MODEL = "claude-3-5-sonnet-latest"
 MAX_TOKENS_DEFAULT = 150
 MAX_TOKENS_ANALYSIS = 1000
+# Batch captioning: Claude calls in flight per batch, and items per batch
+CAPTION_BATCH_CONCURRENCY = int(os.getenv('CAPTION_BATCH_CONCURRENCY', '4'))
+CAPTION_BATCH_MAX_ITEMS = int(os.getenv('CAPTION_BATCH_MAX_ITEMS', '100'))
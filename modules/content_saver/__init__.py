@@ -1,29 +1,35 @@
 from fastapi import HTTPException
 from pydantic import BaseModel
 from pathlib import Path
+from typing import Optional
+from modules.storage_writer import StorageWriter
 
 
 class SaveContentRequest(BaseModel):
     content: str
     filename: str
+    defer: bool = False
 
 
 class ContentSaver:
-    def __init__(self, data_dir: Path):
+    def __init__(self, data_dir: Path, storage_writer: Optional[StorageWriter] = None):
         self.data_dir = data_dir
+        self.storage_writer = storage_writer or StorageWriter()
         self.saved_content_dir = data_dir / 'saved_content'
         self.saved_content_dir.mkdir(exist_ok=True)
 
     async def save_content(self, request: SaveContentRequest):
-        """Save HTML content to a file"""
+        """Save HTML content to a file, or queue the write when ``defer`` is set"""
         try:
             # Create file path
             file_path = self.saved_content_dir / request.filename
             
-            # Write content to file
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(request.content)
-                
+            if getattr(request, 'defer', False):
+                # Respond now; the write lands in the background
+                self.storage_writer.write_later(file_path, request.content)
+                return {"message": "Content queued for saving", "path": str(file_path)}
+
+            await self.storage_writer.write(file_path, request.content)
             return {"message": "Content saved successfully", "path": str(file_path)}
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
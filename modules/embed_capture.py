@@ -0,0 +1,178 @@
+from contextlib import contextmanager
+from typing import Optional, Union
+import base64
+import time
+import logging
+
+from modules.capture_retry import TerminalCaptureError
+
+logger = logging.getLogger(__name__)
+
+EMBED_URL_TEMPLATE = "https://www.youtube.com/embed/{video_id}?start={start}&autoplay=1&modestbranding=1&origin=http://localhost"
+FRAME_CLIP = {'x': 0, 'y': 0, 'width': 1280, 'height': 720}
+DEFAULT_FRAME_READY_TIMEOUT_MS = 5000
+GRAB_MODES = ('png', 'direct')
+DIRECT_GRAB_QUALITY = 80
+
+HIDE_PLAYER_CHROME_CSS = """
+    .ytp-chrome-bottom { display: none !important; }
+    .ytp-large-play-button { display: none !important; }
+    .ytp-gradient-bottom { display: none !important; }
+"""
+
+# Text of the error screen the embed player shows for unavailable,
+# private or embed-disabled videos, or null when it isn't displayed
+PLAYER_ERROR_JS = """() => {
+    const error = document.querySelector('.ytp-error');
+    return error && error.offsetParent !== null ? error.innerText.trim() : null;
+}"""
+
+# Seeks the video and resolves once the target frame has been presented:
+# 'seeked' fires when the seek completes, 'canplay' once data for the current
+# position is buffered, and requestVideoFrameCallback when a frame at that
+# position reaches the compositor. Resolves early with timedOut on timeout.
+SEEK_AND_WAIT_JS = """async ({ t, timeoutMs }) => {
+    const video = document.querySelector('video');
+    const start = performance.now();
+    const marks = {};
+    const once = (event) => new Promise(resolve =>
+        video.addEventListener(event, resolve, { once: true }));
+
+    const ready = (async () => {
+        const seeked = once('seeked');
+        video.currentTime = t;
+        video.play().catch(() => {});
+        await seeked;
+        marks.seeked = performance.now() - start;
+
+        if (video.readyState < HTMLMediaElement.HAVE_FUTURE_DATA) {
+            await once('canplay');
+        }
+        marks.canplay = performance.now() - start;
+
+        if ('requestVideoFrameCallback' in video) {
+            await new Promise(resolve => video.requestVideoFrameCallback(() => resolve()));
+        }
+        marks.frame = performance.now() - start;
+        return false;
+    })();
+    const timeout = new Promise(resolve => setTimeout(() => resolve(true), timeoutMs));
+
+    const timedOut = await Promise.race([ready, timeout]);
+    video.pause();
+    return { timedOut, marks, currentTime: video.currentTime };
+}"""
+
+
+class EncodedFrame:
+    """Frame bytes already encoded in the stored format, ready to write as-is"""
+
+    def __init__(self, data: bytes, image_format: str = 'webp', quality: Optional[int] = None):
+        self.data = data
+        self.image_format = image_format
+        self.quality = quality
+
+
+class StageTimer:
+    """Collects wall-clock durations (ms) for the stages of a capture.
+
+    ``counters`` holds any other per-capture figures, such as network usage.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start)
+
+    def record(self, name: str, started: float):
+        """Record a stage that began at a time.perf_counter() reading"""
+        self.stages[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def total(self) -> float:
+        return round(sum(self.stages.values()), 1)
+
+
+async def load_embed(page, video_id: str, timestamp: float, timer: Optional[StageTimer] = None):
+    """Navigate a page to the YouTube embed for a video and wait for the player"""
+    timer = timer or StageTimer()
+    embed_url = EMBED_URL_TEMPLATE.format(video_id=video_id, start=int(timestamp))
+    with timer.stage('navigate'):
+        await page.goto(embed_url)
+    with timer.stage('network_idle'):
+        await page.wait_for_load_state('networkidle')
+    with timer.stage('video_element'):
+        await page.wait_for_selector('video, .ytp-error')
+        await raise_for_player_error(page)
+        await page.wait_for_selector('video')
+        # Hide the player controls once; the rule also covers controls added later
+        await page.add_style_tag(content=HIDE_PLAYER_CHROME_CSS)
+
+
+async def raise_for_player_error(page):
+    """Raise TerminalCaptureError if the embed player is showing its error screen"""
+    error_text = await page.evaluate(PLAYER_ERROR_JS)
+    if error_text:
+        raise TerminalCaptureError(f"YouTube player error: {' '.join(error_text.split())}")
+
+
+async def grab_video_frame(page, quality: int = DIRECT_GRAB_QUALITY) -> EncodedFrame:
+    """Capture just the video element as WEBP straight from the compositor.
+
+    Uses CDP Page.captureScreenshot with a clip on the element, so Chromium
+    encodes the final WEBP itself and there is no PNG to decode and re-encode.
+    """
+    box = await page.locator('video').bounding_box()
+    viewport = page.viewport_size or {'width': FRAME_CLIP['width'], 'height': FRAME_CLIP['height']}
+    clip = FRAME_CLIP
+    if box and box['width'] > 0 and box['height'] > 0:
+        x, y = max(0, box['x']), max(0, box['y'])
+        clip = {
+            'x': x,
+            'y': y,
+            'width': min(box['x'] + box['width'], viewport['width']) - x,
+            'height': min(box['y'] + box['height'], viewport['height']) - y,
+        }
+
+    cdp = await page.context.new_cdp_session(page)
+    try:
+        result = await cdp.send('Page.captureScreenshot', {
+            'format': 'webp',
+            'quality': quality,
+            'clip': {**clip, 'scale': 1},
+        })
+    finally:
+        await cdp.detach()
+    return EncodedFrame(base64.b64decode(result['data']), 'webp', quality)
+
+
+async def seek_and_grab(page, timestamp: float, timer: Optional[StageTimer] = None,
+                        ready_timeout_ms: int = DEFAULT_FRAME_READY_TIMEOUT_MS,
+                        grab_mode: str = 'png') -> Union[bytes, EncodedFrame]:
+    """Seek the embedded video to a timestamp and grab the frame.
+
+    ``png`` screenshots the viewport as PNG bytes; ``direct`` returns an
+    EncodedFrame of the video element already encoded as WEBP.
+    """
+    timer = timer or StageTimer()
+    with timer.stage('frame_ready'):
+        readiness = await page.evaluate(
+            SEEK_AND_WAIT_JS, {'t': float(timestamp), 'timeoutMs': ready_timeout_ms}
+        )
+    if readiness.get('timedOut'):
+        await raise_for_player_error(page)
+        logger.warning(
+            f"Frame at {timestamp}s not ready after {ready_timeout_ms}ms "
+            f"(reached {readiness.get('marks')}), capturing anyway"
+        )
+
+    with timer.stage('screenshot'):
+        if grab_mode == 'direct':
+            return await grab_video_frame(page)
+        return await page.screenshot(type='png', clip=FRAME_CLIP)
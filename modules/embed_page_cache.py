@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+import asyncio
+import logging
+import time
+
+from modules.embed_capture import load_embed, StageTimer
+
+logger = logging.getLogger(__name__)
+
+JS_HEAP_USED = "performance.memory ? performance.memory.usedJSHeapSize : 0"
+
+
+class _CachedPage:
+    def __init__(self, slot):
+        self.slot = slot
+        self.lock = asyncio.Lock()
+        self.loaded = False
+        self.last_used = time.monotonic()
+        self.heap_bytes = 0
+
+
+class EmbedPageCache:
+    """LRU cache of open embed pages that already have a video loaded.
+
+    A capture on a cached video only seeks and grabs instead of navigating.
+    The cache is bounded by page count and by the sum of the pages' JS heap
+    sizes; pages idle for longer than ``idle_seconds`` are closed by a
+    background sweep, and a page is dropped whenever a capture on it fails.
+    """
+
+    def __init__(self, browser_pool, max_pages: int = 4, max_memory_mb: int = 512,
+                 idle_seconds: int = 300, sweep_interval: int = 30):
+        self.browser_pool = browser_pool
+        self.max_pages = max_pages
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self.idle_seconds = idle_seconds
+        self.sweep_interval = sweep_interval
+        self._pages: "OrderedDict[str, _CachedPage]" = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_pages > 0
+
+    async def start(self):
+        if self.enabled and not self._sweeper:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+            self._sweeper = None
+        for video_id in list(self._pages):
+            await self._evict(video_id)
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logger.error(f"Embed page cache sweep failed: {str(e)}")
+
+    async def _evict(self, video_id: str):
+        entry = self._pages.pop(video_id, None)
+        if entry:
+            await entry.slot.close()
+
+    async def evict_idle(self):
+        """Close pages that have not been used within idle_seconds"""
+        cutoff = time.monotonic() - self.idle_seconds
+        for video_id, entry in list(self._pages.items()):
+            if entry.last_used < cutoff and not entry.lock.locked():
+                logger.info(f"Evicting idle embed page for {video_id}")
+                await self._evict(video_id)
+
+    async def _enforce_limits(self, keep: Optional[str] = None):
+        """Evict least recently used idle pages until count and memory fit"""
+        def over_budget():
+            total_heap = sum(entry.heap_bytes for entry in self._pages.values())
+            return len(self._pages) > self.max_pages or total_heap > self.max_memory_bytes
+
+        for video_id, entry in list(self._pages.items()):
+            if not over_budget():
+                break
+            if video_id != keep and not entry.lock.locked():
+                await self._evict(video_id)
+
+    async def _entry_for(self, video_id: str) -> _CachedPage:
+        entry = self._pages.get(video_id)
+        if entry and not entry.lock.locked() and not self.browser_pool.owns(entry.slot):
+            # The page crashed or the browser was recycled underneath it
+            await self._evict(video_id)
+            entry = None
+        if entry:
+            self._pages.move_to_end(video_id)
+            return entry
+
+        slot = await self.browser_pool.new_slot()
+        entry = self._pages.get(video_id)
+        if entry:
+            # A concurrent miss for the same video opened its page first
+            await slot.close()
+            self._pages.move_to_end(video_id)
+            return entry
+        entry = _CachedPage(slot)
+        self._pages[video_id] = entry
+        await self._enforce_limits(keep=video_id)
+        return entry
+
+    @asynccontextmanager
+    async def page(self, video_id: str, timestamp: float, timer: Optional[StageTimer] = None):
+        """Yield a page with video_id loaded, navigating only on a cache miss"""
+        timer = timer or StageTimer()
+        while True:
+            entry = await self._entry_for(video_id)
+            await entry.lock.acquire()
+            # The page may have been evicted or crashed while we waited for it
+            if self._pages.get(video_id) is entry and self.browser_pool.owns(entry.slot):
+                break
+            entry.lock.release()
+
+        self.browser_pool.mark_busy(True)
+        entry.slot.uses += 1
+        try:
+            if entry.loaded:
+                self.hits += 1
+            else:
+                self.misses += 1
+                await load_embed(entry.slot.page, video_id, timestamp, timer)
+                entry.loaded = True
+            yield entry.slot.page
+            entry.heap_bytes = await entry.slot.page.evaluate(JS_HEAP_USED)
+        except BaseException:
+            await self._evict(video_id)
+            raise
+        finally:
+            entry.last_used = time.monotonic()
+            self.browser_pool.mark_busy(False)
+            entry.lock.release()
+        if entry.slot.uses >= self.browser_pool.max_page_uses:
+            await self._evict(video_id)
+        await self._enforce_limits()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "pages": len(self._pages),
+            "videos": list(self._pages.keys()),
+            "heap_bytes": sum(entry.heap_bytes for entry in self._pages.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
@@ -0,0 +1,146 @@
+from collections import OrderedDict
+from email.utils import formatdate
+from pathlib import Path
+from typing import Optional, Tuple
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+import asyncio
+import hashlib
+import os
+import re
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Unversioned URLs can be rewritten in place (a recapture), so make clients revalidate
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+_etags: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_MAX_ETAGS = 4096
+
+
+def file_version(stat: os.stat_result) -> str:
+    """Short token that changes whenever a file is rewritten, for versioned URLs"""
+    return f"{stat.st_mtime_ns:x}{stat.st_size:x}"
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return f'"{digest.hexdigest()}"'
+
+
+async def file_etag(path: Path, stat: os.stat_result) -> str:
+    """Strong ETag from the file's content, memoized per (path, mtime, size)"""
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    etag = _etags.get(key)
+    if etag is None:
+        etag = await asyncio.to_thread(_hash_file, path)
+        _etags[key] = etag
+        while len(_etags) > _MAX_ETAGS:
+            _etags.popitem(last=False)
+    else:
+        _etags.move_to_end(key)
+    return etag
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore W/ prefixes
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) for a single byte range; None if it can't be satisfied.
+
+    Multi-range requests raise ValueError so the caller serves the whole file.
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        raise ValueError(f"Unsupported range: {header}")
+    first, last = match.groups()
+    if not first and not last:
+        raise ValueError(f"Unsupported range: {header}")
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return None
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return None
+    return start, end
+
+
+async def _iter_file(path: Path, start: int, length: int):
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = length
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+async def serve_file(request: Request, path: Path, media_type: Optional[str] = None,
+                     immutable: bool = False) -> Response:
+    """Stream a file with a strong ETag, conditional GET and single-range support.
+
+    ``immutable`` should only be set when the URL carries a version token, so
+    a rewritten file is fetched under a new URL instead of served stale.
+    """
+    stat = await asyncio.to_thread(path.stat)
+    etag = await file_etag(path, stat)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    size = stat.st_size
+    start, end, status_code = 0, size - 1, 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A stale If-Range means the client's partial copy is outdated: send it all
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            byte_range = (0, size - 1)
+        else:
+            if byte_range is None:
+                headers["Content-Range"] = f"bytes */{size}"
+                return Response(status_code=416, headers=headers)
+            status_code = 206
+            headers["Content-Range"] = f"bytes {byte_range[0]}-{byte_range[1]}/{size}"
+        start, end = byte_range
+
+    length = max(0, end - start + 1)
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        _iter_file(path, start, length),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers
+    )
@@ -0,0 +1,169 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+from modules.storage_writer import StorageWriter
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """Content-addressed cache of Claude replies: an in-memory LRU over a disk tier.
+
+    Entries are keyed by a hash of everything that determines the reply
+    (model, max_tokens and the fully rendered prompt), so a repeated caption
+    or analysis is answered without calling Claude. Disk entries live at
+    ``{cache_dir}/{key[:2]}/{key}.json`` and expire after ``ttl_seconds``;
+    the oldest are evicted once the tier grows past ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir: Path, memory_entries: int = 256, ttl_seconds: float = 7 * 86400,
+                 max_bytes: int = 64 * 1024 * 1024, storage_writer: Optional[StorageWriter] = None):
+        self.cache_dir = cache_dir
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.storage_writer = storage_writer or StorageWriter(fsync=False)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._evicting = False
+        self.disk_bytes = sum(path.stat().st_size for path in self.cache_dir.glob("*/*.json"))
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evicted = 0
+
+    @staticmethod
+    def key(model: str, max_tokens: int, prompt) -> str:
+        """Digest of a request; ``prompt`` may be a string or any JSON-serializable content"""
+        raw = json.dumps([model, max_tokens, prompt], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _remember(self, key: str, created: float, text: str):
+        self._memory[key] = (created, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read(self, key: str) -> Optional[tuple]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        if time.time() - entry["created"] > self.ttl_seconds:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+                self.disk_bytes -= size
+            except FileNotFoundError:
+                pass
+            return None
+        return entry["created"], entry["text"]
+
+    async def get(self, key: str) -> Optional[str]:
+        cached = self._memory.get(key)
+        if cached is not None:
+            if time.time() - cached[0] <= self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return cached[1]
+            del self._memory[key]
+        cached = await asyncio.to_thread(self._read, key)
+        if cached is None:
+            return None
+        self.disk_hits += 1
+        self._remember(key, *cached)
+        return cached[1]
+
+    def put(self, key: str, text: str, model: Optional[str] = None):
+        """Store a reply; the disk write happens in the background"""
+        created = time.time()
+        self._remember(key, created, text)
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        data = json.dumps({"model": model, "created": created, "text": text}, ensure_ascii=False).encode("utf-8")
+        self.storage_writer.write_later(path, data, lambda: self._written(len(data)))
+
+    def _written(self, size: int):
+        self.disk_bytes += size
+        if self.disk_bytes > self.max_bytes and not self._evicting:
+            self._evicting = True
+            asyncio.get_running_loop().create_task(self._evict())
+
+    async def _evict(self):
+        try:
+            await asyncio.to_thread(self._evict_oldest)
+        except Exception as e:
+            logger.error(f"LLM cache eviction failed: {str(e)}")
+        finally:
+            self._evicting = False
+
+    def _evict_oldest(self):
+        """Drop expired entries, then the oldest until the tier is at 90% of its limit"""
+        entries = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                entries.append((path.stat(), path))
+            except FileNotFoundError:
+                pass
+        entries.sort(key=lambda entry: entry[0].st_mtime)
+        total = sum(stat.st_size for stat, _ in entries)
+        expired_before = time.time() - self.ttl_seconds
+        for stat, path in entries:
+            if stat.st_mtime >= expired_before and total <= self.max_bytes * 0.9:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            total -= stat.st_size
+            self.evicted += 1
+        self.disk_bytes = total
+
+    async def lookup(self, key: str, bypass: bool = False) -> Optional[str]:
+        """Cached reply, counted toward the hit ratio; None on a miss or when bypassed"""
+        if bypass:
+            self.bypassed += 1
+            return None
+        cached = await self.get(key)
+        if cached is None:
+            self.misses += 1
+        return cached
+
+    async def get_or_create(self, key: str, factory: Callable[[], Awaitable[str]],
+                            bypass: bool = False, model: Optional[str] = None) -> str:
+        """Cached reply for ``key``, calling ``factory`` on a miss.
+
+        ``bypass`` skips the lookup (an explicit regenerate) but still stores
+        the fresh reply for later calls.
+        """
+        cached = await self.lookup(key, bypass)
+        if cached is not None:
+            return cached
+        text = await factory()
+        self.put(key, text, model)
+        return text
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self.disk_bytes,
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted,
+        }
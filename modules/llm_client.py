@@ -0,0 +1,254 @@
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple, Union
+from anthropic import AsyncAnthropic, APITimeoutError, DefaultAsyncHttpxClient
+from fastapi import HTTPException
+from modules.llm_cache import LLMResponseCache
+import asyncio
+import httpx
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# How often a waiting call checks whether its caller has gone away
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+def _percentiles(samples) -> dict:
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> Optional[float]:
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 1)
+
+    return {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)}
+
+
+# A prompt is plain text or a list of content blocks
+Prompt = Union[str, List[dict]]
+
+
+def cached_block(text: str) -> dict:
+    """Text block marked as a prompt cache breakpoint.
+
+    Claude caches the whole prompt prefix up to and including this block
+    (system first, then messages), so later calls that start with the same
+    prefix read it from cache instead of processing it again. Prefixes
+    shorter than the model's minimum (1024-2048 tokens) are not cached.
+    """
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def usage_stats(usage) -> dict:
+    """Token counts from a response's usage block"""
+    return {
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+    }
+
+
+class LLMClient:
+    """Shared async Claude client for the API routes.
+
+    One pooled HTTP client serves every route, so LLM calls overlap with
+    each other and with captures instead of blocking the event loop. Each
+    call has its own timeout, and is cancelled if the caller disconnects.
+    """
+
+    def __init__(self, api_key: Optional[str], timeout: float = 60.0, max_connections: int = 20,
+                 max_retries: int = 2, base_url: Optional[str] = None,
+                 cache: Optional[LLMResponseCache] = None):
+        self.timeout = timeout
+        self.cache = cache
+        self.client = AsyncAnthropic(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=max_retries,
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            )
+        )
+        self._latencies = deque(maxlen=512)
+        self._first_token_latencies = deque(maxlen=512)
+        self._recent_usage = deque(maxlen=20)
+        self.tokens = {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0,
+        }
+        self.calls = 0
+        self.streams = 0
+        self.in_flight = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    async def create(self, *, timeout: Optional[float] = None,
+                     is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None, **params):
+        """``messages.create`` with a per-call timeout (seconds), cancelled if ``is_disconnected()`` turns true.
+
+        Timeouts surface as 504 and abandoned calls as 499 so routes can re-raise them as is.
+        """
+        self.calls += 1
+        self.in_flight += 1
+        started = time.perf_counter()
+        call = asyncio.create_task(self.client.messages.create(timeout=timeout or self.timeout, **params))
+        try:
+            if is_disconnected is not None:
+                while not call.done():
+                    await asyncio.wait({call}, timeout=DISCONNECT_POLL_SECONDS)
+                    if not call.done() and await is_disconnected():
+                        call.cancel()
+                        self.cancelled += 1
+                        raise HTTPException(status_code=499, detail="Client disconnected")
+            response = await call
+        except APITimeoutError:
+            self.timeouts += 1
+            raise HTTPException(status_code=504, detail=f"Claude did not respond within {timeout or self.timeout}s")
+        except HTTPException:
+            raise
+        except asyncio.CancelledError:
+            call.cancel()
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        latency = time.perf_counter() - started
+        self._latencies.append(latency)
+        self._record_usage(params.get("model"), response.usage, latency)
+        return response
+
+    def _record_usage(self, model: Optional[str], usage, latency: float) -> dict:
+        """Add one call's token usage, prompt cache reads and writes included, to the totals"""
+        counts = usage_stats(usage)
+        for name, count in counts.items():
+            self.tokens[name] += count
+        self._recent_usage.append({"model": model, **counts, "latency_ms": round(latency * 1000, 1)})
+        logger.info(
+            f"Claude {model}: {counts['input_tokens']} input, {counts['output_tokens']} output, "
+            f"{counts['cache_read_input_tokens']} cache read, {counts['cache_creation_input_tokens']} cache write tokens"
+        )
+        return counts
+
+    @staticmethod
+    def _request(prompt: Prompt, system: Optional[Prompt]) -> dict:
+        params = {"messages": [{"role": "user", "content": prompt}]}
+        if system is not None:
+            params["system"] = system
+        return params
+
+    def _cache_key(self, model: str, max_tokens: int, prompt: Prompt, system: Optional[Prompt]) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.key(model, max_tokens, prompt if system is None else {"system": system, "prompt": prompt})
+
+    async def complete(self, prompt: Prompt, model: str, max_tokens: int, system: Optional[Prompt] = None,
+                       regenerate: bool = False, **kwargs) -> str:
+        """Text of a single-turn reply to ``prompt``, from the response cache when possible.
+
+        ``prompt`` and ``system`` may be content block lists with
+        ``cached_block`` breakpoints. ``regenerate`` skips the cached reply
+        and replaces it with a fresh one.
+        """
+        async def call() -> str:
+            response = await self.create(
+                model=model,
+                max_tokens=max_tokens,
+                **self._request(prompt, system),
+                **kwargs
+            )
+            return response.content[0].text.strip()
+
+        key = self._cache_key(model, max_tokens, prompt, system)
+        if key is None:
+            return await call()
+        return await self.cache.get_or_create(key, call, bypass=regenerate, model=model)
+
+    async def stream(self, prompt: Prompt, model: str, max_tokens: int, system: Optional[Prompt] = None,
+                     regenerate: bool = False, timeout: Optional[float] = None) -> AsyncIterator[Tuple[str, dict]]:
+        """Reply to ``prompt`` as it is generated: ("delta", {"text"}) events, then one "done".
+
+        The "done" event carries the whole text, stop reason, token usage and
+        time to first token. A cached reply is sent as a single delta. If the
+        consumer stops early (client disconnect) the request is abandoned.
+        """
+        key = self._cache_key(model, max_tokens, prompt, system)
+        if key is not None:
+            cached = await self.cache.lookup(key, bypass=regenerate)
+            if cached is not None:
+                yield "delta", {"text": cached}
+                yield "done", {"text": cached, "cached": True, "stop_reason": None, "usage": None}
+                return
+
+        self.calls += 1
+        self.streams += 1
+        self.in_flight += 1
+        started = time.perf_counter()
+        first_token = None
+        try:
+            async with self.client.messages.stream(
+                model=model,
+                max_tokens=max_tokens,
+                timeout=timeout or self.timeout,
+                **self._request(prompt, system)
+            ) as stream:
+                async for text in stream.text_stream:
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                        self._first_token_latencies.append(first_token)
+                    yield "delta", {"text": text}
+                message = await stream.get_final_message()
+        except APITimeoutError:
+            self.timeouts += 1
+            raise HTTPException(status_code=504, detail=f"Claude stalled for over {timeout or self.timeout}s")
+        except (asyncio.CancelledError, GeneratorExit):
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        latency = time.perf_counter() - started
+        self._latencies.append(latency)
+        usage = self._record_usage(model, message.usage, latency)
+
+        text = "".join(block.text for block in message.content if block.type == "text").strip()
+        if key is not None:
+            self.cache.put(key, text, model)
+        yield "done", {
+            "text": text,
+            "cached": False,
+            "stop_reason": message.stop_reason,
+            "usage": usage,
+            "time_to_first_token_ms": round(first_token * 1000, 1) if first_token is not None else None,
+        }
+
+    async def close(self):
+        await self.client.close()
+
+    def stats(self) -> dict:
+        # Share of prompt tokens served from the prompt cache
+        cached = self.tokens["cache_read_input_tokens"]
+        prompt_tokens = cached + self.tokens["cache_creation_input_tokens"] + self.tokens["input_tokens"]
+        return {
+            "calls": self.calls,
+            "streams": self.streams,
+            "in_flight": self.in_flight,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "latency_ms": _percentiles(self._latencies),
+            "time_to_first_token_ms": _percentiles(self._first_token_latencies),
+            "tokens": dict(self.tokens),
+            "prompt_cache_read_ratio": round(cached / prompt_tokens, 3) if prompt_tokens else None,
+            "recent_calls": list(self._recent_usage),
+        }
@@ -1,5 +1,5 @@
 from typing import Optional, List, Dict
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, confloat
 from dataclasses import dataclass
 
 @dataclass
@@ -20,12 +20,57 @@ class VideoRequest(BaseModel):
     timestamp: float 
     generate_caption: bool = True
     label: Optional[LabelConfig] = None
+    backend: Optional[str] = None  # Capture backend, defaults to CAPTURE_BACKEND
+    grab_mode: Optional[str] = None  # 'png' or 'direct', defaults to CAPTURE_GRAB_MODE
+    refresh: bool = False  # Recapture even if this frame is already saved
+    idempotency_key: Optional[str] = None  # Alternative to the Idempotency-Key header
+    encoding_profile: Optional[str] = None  # e.g. 'fast-preview', defaults to SCREENSHOT_ENCODING_PROFILE
+    inline: bool = False  # Also return the frame as a base64 data URL (legacy format)
+    dedup: Optional[str] = None  # 'flag' or 'skip' frames nearly identical to one already saved
+    dedup_distance: Optional[int] = None  # Max Hamming distance, defaults to DEDUP_MAX_DISTANCE
+
+class BatchCaptureRequest(BaseModel):
+    video_id: str
+    timestamps: Optional[List[confloat(ge=0)]] = None
+    # Used to build the timestamp list when timestamps are not given
+    start: Optional[float] = Field(None, ge=0)
+    count: int = Field(1, ge=1)  # Checked against BATCH_CAPTURE_MAX_FRAMES before the list is built
+    interval: float = Field(1.0, gt=0)
+    label: Optional[LabelConfig] = None
+    max_tabs: Optional[int] = None
+    encoding_profile: Optional[str] = None
+    inline: bool = False
+    dedup: Optional[str] = None
+    dedup_distance: Optional[int] = None
+
+    def frame_count(self) -> int:
+        """Number of frames requested, without building the timestamp list"""
+        if self.timestamps:
+            return len(self.timestamps)
+        return self.count if self.start is not None else 0
+
+    def resolve_timestamps(self) -> List[float]:
+        if self.timestamps:
+            return list(self.timestamps)
+        if self.start is None:
+            return []
+        return [self.start + i * self.interval for i in range(self.count)]
 
 class CaptionRequest(BaseModel):
     timestamp: float
-    image_data: str
+    image_data: Optional[str] = None  # Not needed by the caption prompt, kept for older clients
     transcript_context: str
     prompt: Optional[str] = None
+    regenerate: bool = False  # Skip the response cache and ask Claude again
+
+class CaptionBatchItem(BaseModel):
+    timestamp: float
+    transcript_context: str
+
+class BatchCaptionRequest(BaseModel):
+    items: List[CaptionBatchItem]
+    prompt: Optional[str] = None  # Shared by every item
+    regenerate: bool = False
 
 class VideoFrameAnalysisRequest(BaseModel):
     video_id: str
@@ -46,12 +91,15 @@ class QuestionRequest(BaseModel):
 
 class TranscriptAnalysisRequest(BaseModel):
     transcript: str
+    regenerate: bool = False
 
 class TranscriptQueryRequest(BaseModel):
     transcript: list
     prompt: str
+    regenerate: bool = False
 
 class SaveContentRequest(BaseModel):
     content: str
     filename: str
+    defer: bool = False  # Respond before the file is written
 
@@ -0,0 +1,143 @@
+from collections import Counter
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import logging
+import weakref
+
+logger = logging.getLogger(__name__)
+
+# Hosts and paths that never contribute to the rendered video frame
+TRACKING_HOSTS = (
+    'doubleclick.net',
+    'googlesyndication.com',
+    'googleadservices.com',
+    'google-analytics.com',
+    'googletagmanager.com',
+    'play.google.com',
+)
+TRACKING_PATHS = (
+    '/api/stats/',
+    '/ptracking',
+    '/pagead/',
+    '/generate_204',
+    '/log_event',
+)
+THUMBNAIL_HOSTS = ('i.ytimg.com', 'yt3.ggpht.com')
+
+# Blocked request sizes aren't known, so savings are estimated per resource type
+ESTIMATED_BYTES = {
+    'image': 20_000,
+    'font': 40_000,
+    'script': 60_000,
+    'stylesheet': 15_000,
+    'media': 200_000,
+}
+DEFAULT_ESTIMATED_BYTES = 2_000
+
+PROFILES: Dict[str, Optional[dict]] = {
+    'off': None,
+    'trackers': {
+        'resource_types': set(),
+        'hosts': TRACKING_HOSTS,
+        'paths': TRACKING_PATHS,
+    },
+    'standard': {
+        'resource_types': {'image', 'font', 'ping', 'manifest', 'texttrack', 'eventsource', 'websocket'},
+        'hosts': TRACKING_HOSTS + THUMBNAIL_HOSTS + ('fonts.googleapis.com', 'fonts.gstatic.com'),
+        'paths': TRACKING_PATHS,
+    },
+}
+
+
+class BlockingStats:
+    """Running request counters for one page"""
+
+    def __init__(self):
+        self.blocked = Counter()
+        self.allowed_requests = 0
+        self.bytes_loaded = 0
+
+    def snapshot(self) -> dict:
+        blocked_requests = sum(self.blocked.values())
+        return {
+            "blocked_requests": blocked_requests,
+            "blocked_by_type": dict(self.blocked),
+            "estimated_bytes_saved": sum(
+                ESTIMATED_BYTES.get(resource_type, DEFAULT_ESTIMATED_BYTES) * count
+                for resource_type, count in self.blocked.items()
+            ),
+            "allowed_requests": self.allowed_requests,
+            "bytes_loaded": self.bytes_loaded,
+        }
+
+
+_page_stats: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_totals = BlockingStats()
+
+
+def _should_block(rules: dict, request) -> bool:
+    if request.resource_type in rules['resource_types']:
+        return True
+    parsed = urlparse(request.url)
+    host = parsed.hostname or ''
+    if any(host == blocked or host.endswith('.' + blocked) for blocked in rules['hosts']):
+        return True
+    return any(path in parsed.path for path in rules['paths'])
+
+
+async def install(page, profile: str) -> Optional[BlockingStats]:
+    """Abort non-essential requests on a page according to a named profile"""
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown resource blocking profile: {profile}")
+    rules = PROFILES[profile]
+    if rules is None:
+        return None
+
+    stats = BlockingStats()
+    _page_stats[page] = stats
+
+    async def handle(route, request):
+        if _should_block(rules, request):
+            stats.blocked[request.resource_type] += 1
+            _totals.blocked[request.resource_type] += 1
+            await route.abort('blockedbyclient')
+        else:
+            stats.allowed_requests += 1
+            _totals.allowed_requests += 1
+            await route.continue_()
+
+    def on_response(response):
+        length = response.headers.get('content-length')
+        if length and length.isdigit():
+            stats.bytes_loaded += int(length)
+            _totals.bytes_loaded += int(length)
+
+    await page.route('**/*', handle)
+    page.on('response', on_response)
+    return stats
+
+
+def page_snapshot(page) -> Optional[dict]:
+    """Current counters for a page, or None if blocking isn't installed on it"""
+    stats = _page_stats.get(page)
+    return stats.snapshot() if stats else None
+
+
+def snapshot_delta(before: Optional[dict], after: Optional[dict]) -> Optional[dict]:
+    """Counters accumulated between two snapshots of the same page"""
+    if before is None or after is None:
+        return after
+    delta = {
+        key: after[key] - before[key]
+        for key in ("blocked_requests", "estimated_bytes_saved", "allowed_requests", "bytes_loaded")
+    }
+    delta["blocked_by_type"] = {
+        resource_type: count - before["blocked_by_type"].get(resource_type, 0)
+        for resource_type, count in after["blocked_by_type"].items()
+        if count - before["blocked_by_type"].get(resource_type, 0)
+    }
+    return delta
+
+
+def totals() -> dict:
+    return _totals.snapshot()
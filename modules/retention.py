@@ -0,0 +1,80 @@
+from typing import Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionScheduler:
+    """Runs screenshot retention in the background on a fixed schedule.
+
+    Cleanup runs in a worker thread, never on the capture path, and runs
+    never overlap: a manual trigger during a scheduled run waits for it.
+    """
+
+    def __init__(self, screenshot_manager, interval_seconds: float = 900, initial_delay: float = 60):
+        self.screenshot_manager = screenshot_manager
+        self.interval_seconds = interval_seconds
+        self.initial_delay = initial_delay
+        self._task: Optional[asyncio.Task] = None
+        self._running: Optional[asyncio.Lock] = None
+        self.runs = 0
+        self.failures = 0
+        self.total_deleted = 0
+        self.total_bytes_reclaimed = 0
+        self.last_run: Optional[dict] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval_seconds > 0
+
+    async def start(self):
+        if self.enabled and not self._task:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run_forever(self):
+        await asyncio.sleep(self.initial_delay)
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Screenshot retention run failed: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def run_once(self) -> dict:
+        if self._running is None:
+            self._running = asyncio.Lock()
+        async with self._running:
+            try:
+                result = await asyncio.to_thread(self.screenshot_manager.cleanup_old_screenshots)
+            except Exception:
+                self.failures += 1
+                raise
+            self.runs += 1
+            self.total_deleted += result["deleted"]
+            self.total_bytes_reclaimed += result["bytes_reclaimed"]
+            self.last_run = {**result, "finished_at": time.time()}
+            if result["deleted"]:
+                logger.info(
+                    f"Retention deleted {result['deleted']} files, reclaimed "
+                    f"{result['bytes_reclaimed']} bytes in {result['duration_ms']}ms"
+                )
+            return result
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "failures": self.failures,
+            "total_deleted": self.total_deleted,
+            "total_bytes_reclaimed": self.total_bytes_reclaimed,
+            "last_run": self.last_run,
+            "store": self.screenshot_manager.index.stats(),
+            "max_bytes": self.screenshot_manager.max_bytes,
+        }
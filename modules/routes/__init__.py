@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from modules.config import (
-    anthropic_client, gif_capture, content_saver, screenshot_manager,
+    llm_client, gif_capture, content_saver, screenshot_manager,
     youtube_client, CLAUDE_MODEL, CLAUDE_SONNET_MODEL,
     MAX_TOKENS_DEFAULT, MAX_TOKENS_ANALYSIS
 )
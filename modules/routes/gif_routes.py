@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from modules.models import GifCaptureRequest
-from modules.config import gif_capture, SCREENSHOTS_DIR
+from modules.config import gif_capture, screenshot_manager, storage_writer
+from modules.screenshot_manager.layout import VIDEO_ID_PATTERN
 import base64
 
 router = APIRouter()
@@ -8,6 +9,8 @@ router = APIRouter()
 @router.post("/capture-gif")
 async def capture_gif(request: GifCaptureRequest):
     """Capture a GIF from a YouTube video"""
+    if not VIDEO_ID_PATTERN.match(request.video_id):
+        raise HTTPException(status_code=400, detail="video_id must be a YouTube video id")
     try:
         gif_data = await gif_capture.capture_gif(
             video_id=request.video_id,
@@ -17,12 +20,12 @@ async def capture_gif(request: GifCaptureRequest):
             width=request.width
         )
         
-        # Save GIF to disk
-        timestamp_str = f"{int(request.start_time)}"
-        file_path = SCREENSHOTS_DIR / f"yt_{request.video_id}_{timestamp_str}.gif"
-        
-        with open(file_path, "wb") as f:
-            f.write(gif_data)
+        # Save GIF to disk after responding; the response carries the GIF itself
+        file_path = screenshot_manager.gif_path(request.video_id, int(request.start_time))
+        storage_writer.write_later(
+            file_path, gif_data,
+            lambda: screenshot_manager.register_file(file_path, request.video_id, int(request.start_time))
+        )
         
         # Convert to base64 for response
         base64_gif = base64.b64encode(gif_data).decode()
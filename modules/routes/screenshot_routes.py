@@ -1,123 +1,434 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
 import asyncio
-from playwright.async_api import async_playwright
+import hashlib
+import json
+import math
+import mimetypes
+from typing import Optional
 from PIL import Image
 import base64
 import io
-from modules.models import VideoRequest, CaptionRequest
+from modules import resource_blocking
+from modules.file_serving import file_version, serve_file
+from modules.sse import sse_response
+from modules.llm_client import cached_block
+from modules.models import VideoRequest, CaptionRequest, BatchCaptureRequest, BatchCaptionRequest
+from modules.capture_retry import is_terminal
+from modules.single_flight import KeyReuseError
+from modules.embed_capture import load_embed, seek_and_grab, StageTimer, EncodedFrame, GRAB_MODES
+from modules.screenshot_manager import DERIVATIVE_WIDTHS
+from modules.screenshot_manager.encoding import ENCODING_PROFILES, EXTENSION_MIME_TYPES, resolve_profile
+from modules.screenshot_manager.layout import VIDEO_ID_PATTERN
 from modules.config import (
-    screenshot_manager, anthropic_client,
-    CLAUDE_MODEL, MAX_TOKENS_DEFAULT
+    screenshot_manager, llm_client, browser_pool, frame_capturer, embed_page_cache,
+    capture_flights, idempotent_captures, capture_scheduler, capture_retry_policy, retention_scheduler,
+    storage_writer,
+    CLAUDE_MODEL, MAX_TOKENS_DEFAULT, DEDUP_MAX_DISTANCE,
+    BATCH_CAPTURE_MAX_TABS, BATCH_CAPTURE_MAX_FRAMES, CAPTION_BATCH_CONCURRENCY, CAPTION_BATCH_MAX_ITEMS,
+    FRAME_READY_TIMEOUT_MS, CAPTURE_GRAB_MODE
 )
 
 router = APIRouter()
 
+DEDUP_MODES = ('flag', 'skip')
+
+def _label_args(label=None) -> dict:
+    """Translate an optional LabelConfig into ScreenshotManager label arguments"""
+    label_config = label.dict() if label else None
+    return {
+        "label_text": label_config['text'] if label_config else None,
+        "font_size": label_config['fontSize'] if label_config else None,
+        "label_color": label_config['color'] if label_config else 'white'
+    }
+
+def _check_video_id(video_id: str):
+    # The store keeps each video's files in a directory named after its id
+    if not VIDEO_ID_PATTERN.match(video_id):
+        raise HTTPException(
+            status_code=400,
+            detail="video_id must be a YouTube video id (letters, digits, '-' and '_')"
+        )
+
+def _check_encoding_profile(profile: Optional[str]):
+    if not profile:
+        return
+    try:
+        resolve_profile(profile)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{str(e)}; available profiles: {', '.join(ENCODING_PROFILES)}"
+        )
+
+def _check_dedup(mode: Optional[str], max_distance: Optional[int]):
+    if mode and mode not in DEDUP_MODES:
+        raise HTTPException(status_code=400, detail=f"dedup must be one of {', '.join(DEDUP_MODES)}")
+    if max_distance is not None and not 0 <= max_distance <= 64:
+        raise HTTPException(status_code=400, detail="dedup_distance must be between 0 and 64")
+
+def _dedup(result: dict, mode: Optional[str], max_distance: Optional[int], inline: bool) -> dict:
+    """Flag a new frame that nearly matches one already saved for the video, or drop it ('skip').
+
+    A skipped frame is deleted and the result points at the existing frame instead.
+    """
+    if not mode or "screenshot_id" not in result:
+        return result
+    file_path = screenshot_manager.resolve_screenshot(result["screenshot_id"])
+    if file_path is None:
+        return result
+    match = screenshot_manager.find_duplicate(
+        file_path, DEDUP_MAX_DISTANCE if max_distance is None else max_distance
+    )
+    if match is None:
+        return result
+    distance, duplicate = match
+    result = {**result, "duplicate_of": duplicate.name, "hamming_distance": distance}
+    if mode == 'skip':
+        screenshot_manager.discard(file_path)
+        result.update(
+            screenshot_id=duplicate.name,
+            image_url=screenshot_manager.screenshot_url(duplicate),
+            skipped=True
+        )
+        if inline:
+            result["image_data"] = screenshot_manager.data_url(duplicate)
+    return result
+
+def _profile_format(encoding_profile: Optional[str]) -> Optional[str]:
+    """Format a requested profile stores frames in; None when no profile was requested"""
+    return resolve_profile(encoding_profile)[0] if encoding_profile else None
+
+def _grab_matches_profile(frame: EncodedFrame, encoding_profile: Optional[str]) -> bool:
+    """Whether a browser-encoded frame is already what the profile would store"""
+    image_format, options = resolve_profile(encoding_profile or screenshot_manager.encoding_profile)
+    return frame.image_format.upper() == image_format and frame.quality == options.get('quality')
+
+async def _save_frame(screenshot_bytes, video_id: str, timestamp: float, label=None,
+                      encoding_profile: Optional[str] = None, hash_frame: bool = False,
+                      inline: bool = False) -> Optional[str]:
+    """Optimize and store a captured frame, returning it as a data URL when ``inline``.
+
+    Only frames saved with ``hash_frame`` (dedup requested) get a perceptual
+    hash, and only hashed frames are compared when looking for duplicates.
+    """
+    if isinstance(screenshot_bytes, EncodedFrame):
+        # Other profiles (JPEG, AVIF, other qualities) re-encode in the encode executor
+        if not label and _grab_matches_profile(screenshot_bytes, encoding_profile):
+            # Already encoded by the browser, write it without decoding
+            return await screenshot_manager.save_encoded_screenshot(
+                screenshot_bytes.data, video_id, int(timestamp), screenshot_bytes.image_format.upper(),
+                hash_frame=hash_frame, inline=inline
+            )
+        screenshot_bytes = screenshot_bytes.data
+    return await screenshot_manager.optimize_and_save_screenshot(
+        screenshot_bytes,
+        video_id,
+        int(timestamp),
+        **_label_args(label),
+        encoding_profile=encoding_profile,
+        hash_frame=hash_frame,
+        inline=inline
+    )
+
+def _screenshot_reference(video_id: str, timestamp: float, label=None,
+                          encoding_profile: Optional[str] = None) -> dict:
+    """Id and versioned URL under which a saved frame is served by GET /api/screenshots/{id}"""
+    file_path = screenshot_manager.find_screenshot(
+        video_id, int(timestamp), **_label_args(label), image_format=_profile_format(encoding_profile)
+    )
+    if file_path is None:
+        return {}
+    return {
+        "screenshot_id": file_path.name,
+        "image_url": screenshot_manager.screenshot_url(file_path)
+    }
+
+def _without_inline_image(result: dict, inline: bool) -> dict:
+    """Drop the (empty) image_data slot unless the caller asked for the legacy inline format"""
+    if inline:
+        return result
+    return {key: value for key, value in result.items() if key != "image_data"}
+
+async def _with_inline_image(result: dict) -> dict:
+    """Add the saved frame as a base64 data URL, read from disk only for callers that want it"""
+    file_path = screenshot_manager.resolve_screenshot(result["screenshot_id"]) if "screenshot_id" in result else None
+    if file_path is None:
+        return result
+    try:
+        return {**result, "image_data": await asyncio.to_thread(screenshot_manager.data_url, file_path)}
+    except FileNotFoundError:
+        return result
+
+def _client_id(http_request: Request) -> str:
+    """Identify the caller for fair queueing, preferring an explicit client id"""
+    if http_request.headers.get('X-Client-Id'):
+        return http_request.headers['X-Client-Id']
+    return http_request.client.host if http_request.client else 'unknown'
+
 @router.post("/capture-screenshot")
-async def capture_screenshot(request: VideoRequest):
-    """Capture a screenshot from a YouTube video using Playwright"""
-    max_retries = 3
-    current_try = 0
-    
-    # Run cleanup before capturing new screenshot
+async def capture_screenshot(request: VideoRequest, http_request: Request,
+                             idempotency_key: Optional[str] = Header(None)):
+    """Capture a screenshot from a YouTube video using a pooled Playwright page"""
+    _check_video_id(request.video_id)
     try:
-        screenshot_manager.cleanup_old_screenshots()
-    except Exception as e:
-        print(f"Cleanup failed but continuing with capture: {str(e)}")
+        frame_capturer.get(request.backend)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown capture backend: {request.backend}")
+    if request.grab_mode and request.grab_mode not in GRAB_MODES:
+        raise HTTPException(status_code=400, detail=f"grab_mode must be one of {', '.join(GRAB_MODES)}")
+    _check_encoding_profile(request.encoding_profile)
+    _check_dedup(request.dedup, request.dedup_distance)
     
-    # Extract whether to generate captions
-    generate_caption = getattr(request, 'generate_caption', True)
+    # A retried request with the same key replays the first response
+    client_id = _client_id(http_request)
+    key = idempotency_key or request.idempotency_key
+    if key:
+        try:
+            result = await idempotent_captures.run(
+                key, lambda: _capture_or_reuse(request, client_id), fingerprint=_request_fingerprint(request)
+            )
+        except KeyReuseError:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency key was already used for a different capture request"
+            )
+    else:
+        result = await _capture_or_reuse(request, client_id)
+    
+    # Shared and replayed results never carry base64; inline callers get it added here
+    if request.inline:
+        result = await _with_inline_image(result)
+    # Extract whether to generate captions; the result may be shared with other callers, so copy it
+    if getattr(request, 'generate_caption', True):
+        result = {**result, "generate_caption": True}
+    return result
+
+def _request_fingerprint(request: VideoRequest) -> str:
+    """Digest of a capture request's body, without the idempotency key itself"""
+    body = json.dumps(request.dict(exclude={'idempotency_key'}), sort_keys=True)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+async def _capture_or_reuse(request: VideoRequest, client_id: str) -> dict:
+    """Serve a frame already on disk, or capture it once for all concurrent callers"""
+    label_args = _label_args(request.label)
+    if not request.refresh:
+        # A frame saved under another profile's format doesn't answer this request
+        reference = _screenshot_reference(
+            request.video_id, request.timestamp, request.label, request.encoding_profile
+        )
+        if reference:
+            screenshot_manager.index.touch(reference["screenshot_id"])
+            print(f"Serving saved screenshot for {request.video_id} at {int(request.timestamp)}s")
+            return {**reference, "cached": True}
+
+    # Known-bad videos and a failing capture stack are answered without a slot
+    capture_retry_policy.check(request.video_id)
+
+    frame_key = (
+        request.video_id,
+        int(request.timestamp),
+        screenshot_manager.label_key(**label_args),
+        request.encoding_profile,
+        request.dedup,
+        request.dedup_distance
+    )
+    return await capture_flights.run(frame_key, lambda: _scheduled_capture(request, client_id))
+
+async def _scheduled_capture(request: VideoRequest, client_id: str) -> dict:
+    """Wait for a capture slot, answering 429 when the queue is full"""
+    async with capture_scheduler.slot(client_id):
+        return await _capture_with_retries(request)
+
+async def _capture_with_retries(request: VideoRequest) -> dict:
+    max_retries = capture_retry_policy.max_attempts
+    current_try = 0
     
     while current_try < max_retries:
         try:
             current_try += 1
             print(f"Screenshot attempt {current_try} of {max_retries}")
             
-            async with async_playwright() as p:
-                browser = await p.chromium.launch()
-                page = await browser.new_page()
-                
-                # Set a user agent for authenticity
-                await page.set_extra_http_headers({
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                })
-
-                # Try embedding with modest branding and origin parameters
-                embed_url = f"https://www.youtube.com/embed/{request.video_id}?start={int(request.timestamp)}&autoplay=1&modestbranding=1&origin=http://localhost"
-                await page.goto(embed_url)
-                
-                await page.wait_for_load_state('networkidle')
-                
-                # Wait for and handle video element
-                await page.wait_for_selector('video')
-                await page.evaluate("""
-                    const video = document.querySelector('video');
-                    video.currentTime = parseInt(new URL(window.location.href).searchParams.get('start'));
-                    video.play();
-                """)
-                
-                # Wait for frame to load
-                await asyncio.sleep(1.5)
-                
-                # Pause video and remove controls
-                await page.evaluate("document.querySelector('video').pause()")
-                await page.add_style_tag(content="""
-                    .ytp-chrome-bottom { display: none !important; }
-                    .ytp-large-play-button { display: none !important; }
-                    .ytp-gradient-bottom { display: none !important; }
-                """)
-                
-                # Take screenshot
-                screenshot_bytes = await page.screenshot(
-                    type='png',
-                    clip={'x': 0, 'y': 0, 'width': 1280, 'height': 720}
-                )
-                
-                label_config = request.label.dict() if request.label else None
-                base64_screenshot = screenshot_manager.optimize_and_save_screenshot(
-                    screenshot_bytes,
-                    request.video_id,
-                    int(request.timestamp),
-                    label_text=label_config['text'] if label_config else None,
-                    font_size=label_config['fontSize'] if label_config else None,
-                    label_color=label_config['color'] if label_config else 'white'
+            timer = StageTimer()
+            screenshot_bytes, backend_used = await frame_capturer.capture(
+                request.video_id, request.timestamp, request.backend, timer, request.grab_mode
+            )
+
+            with timer.stage('encode'):
+                await _save_frame(
+                    screenshot_bytes, request.video_id, request.timestamp, request.label,
+                    request.encoding_profile, hash_frame=bool(request.dedup)
                 )
-                
-                print("Screenshot captured and saved successfully")
-                if not generate_caption:
-                    return {"image_data": f"data:image/webp;base64,{base64_screenshot}"}
-                    
-                return {
-                    "image_data": f"data:image/webp;base64,{base64_screenshot}",
-                    "generate_caption": True
-                }
+            
+            capture_retry_policy.record_success(request.video_id)
+            print(f"Screenshot captured and saved successfully in {timer.total()}ms: {timer.stages}")
+            return _dedup({
+                **_screenshot_reference(
+                    request.video_id, request.timestamp, request.label, request.encoding_profile
+                ),
+                "timings_ms": timer.stages,
+                "backend": backend_used,
+                **timer.counters
+            }, request.dedup, request.dedup_distance, inline=False)
                 
         except Exception as e:
             print(f"Screenshot attempt {current_try} failed: {str(e)}")
+            terminal = is_terminal(e)
+            if terminal:
+                capture_retry_policy.record_failure(request.video_id, e, terminal=True)
+                raise HTTPException(status_code=422, detail=f"Screenshot cannot be captured: {str(e)}")
             if current_try >= max_retries:
+                capture_retry_policy.record_failure(request.video_id, e, terminal=False)
                 raise HTTPException(
                     status_code=500,
                     detail=f"Failed to capture screenshot after {max_retries} attempts: {str(e)}"
                 )
-            await asyncio.sleep(2)  # Wait before retry
+            await asyncio.sleep(capture_retry_policy.delay(current_try))
 
-@router.post("/generate-caption")
-async def generate_caption(screenshot: CaptionRequest):
-    """Generate AI caption for screenshot with improved context handling"""
-    try:
-        transcript_text = screenshot.transcript_context.strip()
-        if not transcript_text:
-            raise HTTPException(status_code=400, detail="No transcript context provided")
+@router.post("/capture-screenshots/batch")
+async def capture_screenshot_batch(request: BatchCaptureRequest, http_request: Request):
+    """Capture a burst of frames from one embed session per tab, streamed back as NDJSON"""
+    _check_video_id(request.video_id)
+    frame_count = request.frame_count()
+    if not frame_count:
+        raise HTTPException(status_code=400, detail="Provide timestamps or a start time")
+    if frame_count > BATCH_CAPTURE_MAX_FRAMES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can capture at most {BATCH_CAPTURE_MAX_FRAMES} frames"
+        )
+    timestamps = request.resolve_timestamps()
+    _check_encoding_profile(request.encoding_profile)
+    _check_dedup(request.dedup, request.dedup_distance)
 
-        base_prompt = screenshot.prompt if screenshot.prompt else """Generate a concise and informative caption for this moment in the video.
-            The caption should be a direct statement about the key point, without referring to the video or transcript."""
+    client_id = _client_id(http_request)
+    capture_retry_policy.check(request.video_id)
+    capture_scheduler.check_admission(client_id)
 
-        prompt = f"""Here is the transcript context around timestamp {screenshot.timestamp}:
+    tabs = min(request.max_tabs or BATCH_CAPTURE_MAX_TABS, BATCH_CAPTURE_MAX_TABS,
+               browser_pool.size, len(timestamps))
+    tabs = max(1, tabs)
 
-{transcript_text}
+    # Each tab seeks forward through a contiguous run of the sorted timestamps
+    order = sorted(range(len(timestamps)), key=lambda i: timestamps[i])
+    chunk_size = math.ceil(len(order) / tabs)
+    chunks = [order[i:i + chunk_size] for i in range(0, len(order), chunk_size)]
+    results = asyncio.Queue()
 
-{base_prompt}
+    async def run_tab(indexes):
+        reported = set()
+        try:
+            async with capture_scheduler.slot(client_id):
+                try:
+                    async with browser_pool.page() as page:
+                        await load_embed(page, request.video_id, timestamps[indexes[0]])
+                        for index in indexes:
+                            timestamp = timestamps[index]
+                            timer = StageTimer()
+                            try:
+                                screenshot_bytes = await seek_and_grab(
+                                    page, timestamp, timer, FRAME_READY_TIMEOUT_MS, CAPTURE_GRAB_MODE
+                                )
+                                with timer.stage('encode'):
+                                    image_data = await _save_frame(
+                                        screenshot_bytes, request.video_id, timestamp, request.label,
+                                        request.encoding_profile, hash_frame=bool(request.dedup),
+                                        inline=request.inline
+                                    )
+                                result = _dedup({
+                                    "index": index,
+                                    "timestamp": timestamp,
+                                    "image_data": image_data,
+                                    **_screenshot_reference(
+                                        request.video_id, timestamp, request.label, request.encoding_profile
+                                    ),
+                                    "timings_ms": timer.stages
+                                }, request.dedup, request.dedup_distance, request.inline)
+                            except Exception as e:
+                                print(f"Batch frame at {timestamp}s failed: {str(e)}")
+                                result = {"index": index, "timestamp": timestamp, "error": str(e)}
+                            reported.add(index)
+                            await results.put(_without_inline_image(result, request.inline))
+                except Exception as e:
+                    # Only a failed capture counts toward the breakers, not a refused admission
+                    capture_retry_policy.record_failure(request.video_id, e, terminal=is_terminal(e))
+                    raise
+        except Exception as e:
+            print(f"Batch capture tab failed: {str(e)}")
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            for index in indexes:
+                if index not in reported:
+                    await results.put({"index": index, "timestamp": timestamps[index], "error": detail})
 
-Generate a caption consisting of 3 bullet points that AVOIDS using introductory statements like here is a caption consisting of 3 bullet points that meet the specified criteria:
+    async def stream():
+        workers = [asyncio.create_task(run_tab(chunk)) for chunk in chunks]
+        captured = failed = skipped = 0
+        try:
+            for _ in range(len(timestamps)):
+                result = await results.get()
+                if "error" in result:
+                    failed += 1
+                elif result.get("skipped"):
+                    skipped += 1
+                else:
+                    captured += 1
+                yield json.dumps(result) + "\n"
+            yield json.dumps({"done": True, "captured": captured, "skipped": skipped, "failed": failed}) + "\n"
+        finally:
+            # Stop remaining work if the client disconnected mid-stream
+            for worker in workers:
+                worker.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.get("/screenshots/{screenshot_id}")
+async def get_screenshot(screenshot_id: str, http_request: Request,
+                         derivative: Optional[str] = None, v: Optional[str] = None):
+    """Serve a saved screenshot, or a smaller derivative of it ('thumb' or 'preview').
+
+    Responses carry a strong ETag and honour byte ranges. URLs with the
+    current version token (``v``) are cacheable forever; others revalidate.
+    """
+    file_path = screenshot_manager.resolve_screenshot(screenshot_id)
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+    immutable = v is not None and v == file_version(file_path.stat())
+    screenshot_manager.touch(file_path)
+    if derivative:
+        if derivative not in DERIVATIVE_WIDTHS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"derivative must be one of {', '.join(DERIVATIVE_WIDTHS)}"
+            )
+        file_path = await screenshot_manager.get_derivative(file_path, derivative)
+    return await serve_file(
+        http_request, file_path,
+        EXTENSION_MIME_TYPES.get(file_path.suffix) or mimetypes.guess_type(file_path.name)[0],
+        immutable
+    )
+
+@router.get("/capture-stats")
+async def capture_stats():
+    """Report capture queue, browser pool and warm page cache usage"""
+    return {
+        "scheduler": capture_scheduler.stats(),
+        "browser_pool": browser_pool.stats(),
+        "embed_page_cache": embed_page_cache.stats(),
+        "resource_blocking": resource_blocking.totals(),
+        "circuit_breakers": capture_retry_policy.stats(),
+        "coalescing": capture_flights.stats(),
+        "idempotency": idempotent_captures.stats(),
+        "retention": retention_scheduler.stats(),
+        "dedup": screenshot_manager.similarity.stats(),
+        "storage": storage_writer.stats()
+    }
+
+# Instructions shared by every caption request, sent as a cached system
+# prefix ahead of the per-moment transcript. On their own they are shorter
+# than the model's minimum cacheable prefix, and the transcript window
+# differs per moment, so caption calls normally miss the prompt cache; the
+# breakpoint only pays off if the instructions grow past that minimum.
+CAPTION_SYSTEM = [cached_block("""Generate a caption consisting of 3 bullet points that AVOIDS using introductory statements like here is a caption consisting of 3 bullet points that meet the specified criteria:
 1. Makes direct, actionable statements about each of the 3 key points
 2. Uses relevant technical terms or concepts
 3. Avoids phrases like "The video shows...", "In this screenshot...", "The speaker explains..."
@@ -128,55 +439,69 @@ Examples:
 ✅ "Maintain a firm grip while keeping wrists relaxed during the backswing"
 
 ❌ "The speaker explains the importance of data structures"
-✅ "Hash tables provide O(1) average time complexity for lookups"
+✅ "Hash tables provide O(1) average time complexity for lookups\"""")]
+
+def _caption_prompt(timestamp: float, transcript_text: str, prompt: Optional[str] = None) -> str:
+    """Per-moment part of a three-bullet caption prompt; the rules are in CAPTION_SYSTEM"""
+    base_prompt = prompt if prompt else """Generate a concise and informative caption for this moment in the video.
+            The caption should be a direct statement about the key point, without referring to the video or transcript."""
+
+    return f"""Here is the transcript context around timestamp {timestamp}:
+
+{transcript_text}
+
+{base_prompt}
 
 Caption:"""
 
-        response = anthropic_client.messages.create(
-            model=CLAUDE_MODEL,
-            max_tokens=MAX_TOKENS_DEFAULT,
-            messages=[{
-                "role": "user",
-                "content": prompt
-            }]
+def _caption_transcript(screenshot: CaptionRequest) -> str:
+    transcript_text = screenshot.transcript_context.strip()
+    if not transcript_text:
+        raise HTTPException(status_code=400, detail="No transcript context provided")
+    return transcript_text
+
+@router.post("/generate-caption")
+async def generate_caption(screenshot: CaptionRequest, http_request: Request):
+    """Generate AI caption for screenshot with improved context handling"""
+    try:
+        transcript_text = _caption_transcript(screenshot)
+        prompt = _caption_prompt(screenshot.timestamp, transcript_text, screenshot.prompt)
+
+        caption = await llm_client.complete(
+            prompt, CLAUDE_MODEL, MAX_TOKENS_DEFAULT, system=CAPTION_SYSTEM,
+            regenerate=screenshot.regenerate, is_disconnected=http_request.is_disconnected
         )
-        
-        caption = response.content[0].text.strip()
         return {"caption": caption}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Caption error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate-caption/stream")
+async def generate_caption_stream(screenshot: CaptionRequest):
+    """Server-sent events variant of /generate-caption: 'delta' events as text arrives, then 'done'"""
+    prompt = _caption_prompt(screenshot.timestamp, _caption_transcript(screenshot), screenshot.prompt)
+    return sse_response(
+        llm_client.stream(
+            prompt, CLAUDE_MODEL, MAX_TOKENS_DEFAULT, system=CAPTION_SYSTEM, regenerate=screenshot.regenerate
+        )
+    )
+
 @router.post("/cleanup-screenshots")
 async def cleanup_screenshots():
-    """Manually trigger screenshot cleanup"""
+    """Run screenshot retention now instead of waiting for the next scheduled run"""
     try:
-        return screenshot_manager.cleanup_old_screenshots()
+        return await retention_scheduler.run_once()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/generate-structured-caption")
-async def generate_structured_caption(screenshot: CaptionRequest):
-    """Generate AI caption for screenshot with improved structured format"""
-    try:
-        transcript_text = screenshot.transcript_context.strip()
-        if not transcript_text:
-            raise HTTPException(status_code=400, detail="No transcript context provided")
-
-        base_prompt = screenshot.prompt if screenshot.prompt else """Generate a structured caption for this moment in the video."""
-
-        prompt = f"""After you're done, 
-        Double check that you have always:
-        1) Keep each bullet point concise and actionable.
-        2) Avoid phrases like "In this video" or "The speaker explains" or "The speaker is discussing". 
-        3) Generate the content as if you are the person who created the content in the video and you are explaining the key points to someone else. Never refer to the video or transcript directly.
-        Follow these rules at all costs.
-        
-        Here is the transcript context around timestamp {screenshot.timestamp}:
-
-{transcript_text}
-
-{base_prompt}
+# Same prompt cache caveat as CAPTION_SYSTEM
+STRUCTURED_CAPTION_SYSTEM = [cached_block("""Double check that you have always:
+1) Keep each bullet point concise and actionable.
+2) Avoid phrases like "In this video" or "The speaker explains" or "The speaker is discussing". 
+3) Generate the content as if you are the person who created the content in the video and you are explaining the key points to someone else. Never refer to the video or transcript directly.
+Follow these rules at all costs.
 
 Generate a structured caption in this exact format:
 TOPIC HEADING: A clear, concise topic title
@@ -192,35 +517,121 @@ Double check that you have always:
 1) Keep each bullet point concise and actionable.
 2) Avoid phrases like "In this video" or "The speaker explains" or "The speaker is discussing". 
 3) Speak as if you are the person who created the content in the video and you are explaining the key points to someone else. Never refer to the video or transcript directly.
-Follow these rules at all costs.
-"""
-
-        response = anthropic_client.messages.create(
-            model=CLAUDE_MODEL,
-            max_tokens=MAX_TOKENS_DEFAULT,
-            messages=[{
-                "role": "user",
-                "content": prompt
-            }]
+Follow these rules at all costs.""")]
+
+def _structured_caption_prompt(timestamp: float, transcript_text: str, prompt: Optional[str] = None) -> str:
+    """Per-moment part of a structured caption prompt; the format is in STRUCTURED_CAPTION_SYSTEM"""
+    base_prompt = prompt if prompt else """Generate a structured caption for this moment in the video."""
+
+    return f"""Here is the transcript context around timestamp {timestamp}:
+
+{transcript_text}
+
+{base_prompt}"""
+
+def _caption_content_type(caption: str) -> str:
+    """Guess what a frame shows from its caption"""
+    content_type = "text"  # default type
+    if "slide" in caption.lower() or "presentation" in caption.lower():
+        content_type = "slide"
+    elif any(term in caption.lower() for term in ["demo", "demonstration", "showing", "example"]):
+        content_type = "demo"
+    return content_type
+
+@router.post("/generate-structured-caption")
+async def generate_structured_caption(screenshot: CaptionRequest, http_request: Request):
+    """Generate AI caption for screenshot with improved structured format"""
+    try:
+        transcript_text = _caption_transcript(screenshot)
+        prompt = _structured_caption_prompt(screenshot.timestamp, transcript_text, screenshot.prompt)
+
+        caption = await llm_client.complete(
+            prompt, CLAUDE_MODEL, MAX_TOKENS_DEFAULT, system=STRUCTURED_CAPTION_SYSTEM,
+            regenerate=screenshot.regenerate, is_disconnected=http_request.is_disconnected
         )
-        
-        caption = response.content[0].text.strip()
         print("Generated caption:", caption)  # Add debugging
         
-        # Determine content type based on caption
-        content_type = "text"  # default type
-        if "slide" in caption.lower() or "presentation" in caption.lower():
-            content_type = "slide"
-        elif any(term in caption.lower() for term in ["demo", "demonstration", "showing", "example"]):
-            content_type = "demo"
-        
         result = {
             "structured_caption": caption,
-            "content_type": content_type
+            "content_type": _caption_content_type(caption)
         }
         print("Returning:", result)  # Add debugging
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Caption error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/generate-structured-caption/stream")
+async def generate_structured_caption_stream(screenshot: CaptionRequest):
+    """Server-sent events variant of /generate-structured-caption; 'done' also carries content_type"""
+    prompt = _structured_caption_prompt(screenshot.timestamp, _caption_transcript(screenshot), screenshot.prompt)
+
+    async def events():
+        async for event, data in llm_client.stream(
+            prompt, CLAUDE_MODEL, MAX_TOKENS_DEFAULT, system=STRUCTURED_CAPTION_SYSTEM,
+            regenerate=screenshot.regenerate
+        ):
+            if event == "done":
+                data = {**data, "content_type": _caption_content_type(data["text"])}
+            yield event, data
+
+    return sse_response(events())
+
+@router.post("/generate-structured-captions/batch")
+async def generate_structured_captions_batch(request: BatchCaptionRequest):
+    """Caption many frames with bounded concurrency, streamed back as NDJSON as each finishes"""
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Provide at least one item")
+    if len(request.items) > CAPTION_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can caption at most {CAPTION_BATCH_MAX_ITEMS} items"
+        )
+
+    slots = asyncio.Semaphore(CAPTION_BATCH_CONCURRENCY)
+    results = asyncio.Queue()
+
+    async def caption_item(index: int, item):
+        try:
+            transcript_text = item.transcript_context.strip()
+            if not transcript_text:
+                raise ValueError("No transcript context provided")
+            async with slots:
+                caption = await llm_client.complete(
+                    _structured_caption_prompt(item.timestamp, transcript_text, request.prompt),
+                    CLAUDE_MODEL, MAX_TOKENS_DEFAULT, system=STRUCTURED_CAPTION_SYSTEM,
+                    regenerate=request.regenerate
+                )
+            result = {
+                "index": index,
+                "timestamp": item.timestamp,
+                "structured_caption": caption,
+                "content_type": _caption_content_type(caption)
+            }
+        except Exception as e:
+            print(f"Batch caption at {item.timestamp}s failed: {str(e)}")
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            result = {"index": index, "timestamp": item.timestamp, "error": detail}
+        await results.put(result)
+
+    async def stream():
+        workers = [asyncio.create_task(caption_item(i, item)) for i, item in enumerate(request.items)]
+        captioned = failed = 0
+        try:
+            for _ in range(len(workers)):
+                result = await results.get()
+                if "error" in result:
+                    failed += 1
+                else:
+                    captioned += 1
+                yield json.dumps(result) + "\n"
+            yield json.dumps({"done": True, "captioned": captioned, "failed": failed}) + "\n"
+        finally:
+            # Stop outstanding calls if the client disconnected mid-stream
+            for worker in workers:
+                worker.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
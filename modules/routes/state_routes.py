@@ -1,12 +1,19 @@
 from fastapi import APIRouter, HTTPException, Query
-from modules.config import DATA_DIR, SCREENSHOTS_DIR
+from modules.config import DATA_DIR, SCREENSHOTS_DIR, screenshot_manager, storage_writer
+import base64
 import json
+import mimetypes
+import shutil
 
 router = APIRouter()
 
 @router.get("/state/load")
-async def load_state():
-    """Load application state from file system"""
+async def load_state(inline: bool = Query(False)):
+    """Load application state from file system.
+
+    Saved screenshots are returned as URLs served by /api/screenshots; pass
+    ``inline=true`` for the legacy base64 data URLs.
+    """
     try:
         state_file = DATA_DIR / "app_state.json"
         if not state_file.exists():
@@ -16,15 +23,19 @@ async def load_state():
             state = json.load(f)
 
         if "screenshots" in state:
-            screenshots_dir = DATA_DIR / "screenshots"
             for screenshot in state["screenshots"]:
                 if "image" in screenshot and isinstance(screenshot["image"], str):
-                    image_path = screenshots_dir / screenshot["image"]
-                    if image_path.exists():
+                    image_path = screenshot_manager.resolve_screenshot(screenshot["image"])
+                    if image_path:
                         try:
-                            with open(image_path, "rb") as f:
-                                image_data = base64.b64encode(f.read()).decode()
-                                screenshot["image"] = f"data:image/png;base64,{image_data}"
+                            if inline:
+                                with open(image_path, "rb") as f:
+                                    image_data = base64.b64encode(f.read()).decode()
+                                mime_type = mimetypes.guess_type(image_path.name)[0] or "image/png"
+                                screenshot["image"] = f"data:{mime_type};base64,{image_data}"
+                            else:
+                                screenshot["screenshotId"] = image_path.name
+                                screenshot["image"] = screenshot_manager.screenshot_url(image_path)
                         except Exception as e:
                             print(f"Error loading screenshot: {e}")
 
@@ -38,19 +49,16 @@ async def clear_state(eraseFiles: bool = Query(False)):
     try:
         print(f"Clearing state with eraseFiles={eraseFiles}")
         
-        screenshots_dir = DATA_DIR / "screenshots"
+        screenshots_dir = SCREENSHOTS_DIR
         if screenshots_dir.exists():
             if eraseFiles:
                 print("Deleting screenshots directory")
-                for file in screenshots_dir.glob("*"):
-                    try:
-                        file.unlink()
-                    except Exception as e:
-                        print(f"Error deleting file {file}: {e}")
-                try:
-                    screenshots_dir.rmdir()
-                except Exception as e:
-                    print(f"Error removing screenshots directory: {e}")
+                # The store is sharded into per-video directories, so remove the whole tree
+                shutil.rmtree(
+                    screenshots_dir,
+                    onerror=lambda _, path, exc_info: print(f"Error deleting {path}: {exc_info[1]}")
+                )
+                screenshot_manager.index.clear()
             else:
                 print("Keeping screenshot files")
 
@@ -61,8 +69,7 @@ async def clear_state(eraseFiles: bool = Query(False)):
                 state_file.unlink()
             else:
                 print("Clearing state file contents")
-                with open(state_file, "w") as f:
-                    json.dump({}, f)
+                await storage_writer.write(state_file, json.dumps({}))
 
         if eraseFiles:
             print("Recreating directories")
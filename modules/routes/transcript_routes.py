@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from modules.models import TranscriptQueryRequest, TranscriptAnalysisRequest
 from modules.config import (
-    anthropic_client, CLAUDE_MODEL, CLAUDE_SONNET_MODEL,
+    llm_client, llm_cache, CLAUDE_MODEL, CLAUDE_SONNET_MODEL,
     MAX_TOKENS_DEFAULT, MAX_TOKENS_ANALYSIS
 )
+from modules.sse import sse_response
+from modules.llm_client import cached_block
 from transcript_retriever import EnhancedTranscriptRetriever
 
 router = APIRouter()
@@ -32,39 +34,8 @@ async def get_transcript(video_id: str):
             error_msg = "No transcript/captions available for this video"
         raise HTTPException(status_code=404, detail=error_msg)
 
-@router.post("/query-transcript")
-async def query_transcript(request: TranscriptQueryRequest):
-    """Process a query about the transcript using Claude"""
-    try:
-        # Validate transcript structure
-        if not isinstance(request.transcript, list):
-            raise HTTPException(status_code=422, detail="Transcript must be a list")
-
-        if not request.transcript:
-            raise HTTPException(status_code=422, detail="Transcript cannot be empty")
-
-        # Format transcript
-        formatted_transcript = []
-        for item in request.transcript:
-            if not isinstance(item, dict) or 'start' not in item or 'text' not in item:
-                raise HTTPException(
-                    status_code=422,
-                    detail="Each transcript entry must have 'start' and 'text' fields"
-                )
-                
-            timestamp = item['start']
-            hours = int(timestamp // 3600)
-            minutes = int((timestamp % 3600) // 60)
-            seconds = int(timestamp % 60)
-            time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-            formatted_transcript.append(f"[{time_str}] {item['text']}")
-            
-        transcript_text = "\n".join(formatted_transcript)
-
-        prompt = f"""Based on this video transcript, answer the following question or respond to this request: {request.prompt}
-
-Transcript:
-{transcript_text}
+# Response rules for transcript questions; the same for every video
+QUERY_SYSTEM = [cached_block("""Answer questions and requests about a video transcript.
 
 Provide your response following these exact rules:
 1. Avoid using introductory statements or phrases like "The video shows...", "In this screenshot...", "The speaker explains..."
@@ -84,20 +55,57 @@ Example of desired format:
 **Second Topic:**
 * The first step involves positioning your hands correctly
 * You'll want to maintain this position throughout the movement
-* This creates the optimal angle for power generation [00:08:45]
+* This creates the optimal angle for power generation [00:08:45]""")]
 
-Response:"""
+def _query_prompt(request: TranscriptQueryRequest) -> list:
+    """Validate and format the transcript, and build the question prompt.
 
-        response = anthropic_client.messages.create(
-            model=CLAUDE_SONNET_MODEL,
-            max_tokens=MAX_TOKENS_ANALYSIS,
-            messages=[{
-                "role": "user",
-                "content": prompt
-            }]
-        )
+    The transcript goes first as a cached block so follow-up questions on the
+    same video reuse it from the prompt cache; only the question is new.
+    """
+    # Validate transcript structure
+    if not isinstance(request.transcript, list):
+        raise HTTPException(status_code=422, detail="Transcript must be a list")
+
+    if not request.transcript:
+        raise HTTPException(status_code=422, detail="Transcript cannot be empty")
+
+    # Format transcript
+    formatted_transcript = []
+    for item in request.transcript:
+        if not isinstance(item, dict) or 'start' not in item or 'text' not in item:
+            raise HTTPException(
+                status_code=422,
+                detail="Each transcript entry must have 'start' and 'text' fields"
+            )
+            
+        timestamp = item['start']
+        hours = int(timestamp // 3600)
+        minutes = int((timestamp % 3600) // 60)
+        seconds = int(timestamp % 60)
+        time_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+        formatted_transcript.append(f"[{time_str}] {item['text']}")
         
-        answer = response.content[0].text.strip()
+    transcript_text = "\n".join(formatted_transcript)
+
+    return [
+        cached_block(f"Transcript:\n{transcript_text}"),
+        {
+            "type": "text",
+            "text": f"Answer the following question or respond to this request: {request.prompt}\n\nResponse:"
+        },
+    ]
+
+@router.post("/query-transcript")
+async def query_transcript(request: TranscriptQueryRequest, http_request: Request):
+    """Process a query about the transcript using Claude"""
+    try:
+        prompt = _query_prompt(request)
+
+        answer = await llm_client.complete(
+            prompt, CLAUDE_SONNET_MODEL, MAX_TOKENS_ANALYSIS, system=QUERY_SYSTEM,
+            regenerate=request.regenerate, is_disconnected=http_request.is_disconnected
+        )
         return {
             "response": answer,
             "prompt": request.prompt,
@@ -108,32 +116,64 @@ Response:"""
         print(f"Error processing transcript query: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+@router.post("/query-transcript/stream")
+async def query_transcript_stream(request: TranscriptQueryRequest):
+    """Server-sent events variant of /query-transcript: 'delta' events as text arrives, then 'done'"""
+    prompt = _query_prompt(request)
+    return sse_response(
+        llm_client.stream(
+            prompt, CLAUDE_SONNET_MODEL, MAX_TOKENS_ANALYSIS, system=QUERY_SYSTEM, regenerate=request.regenerate
+        )
+    )
+
+ANALYSIS_SYSTEM = [cached_block("""Analyze this video transcript and provide:
+
+1. A high-level summary of the main topics in bullet points
+2. Key points and takeaways, comprehensive (bullet points)
+3. Any important technical terms or concepts mentioned, with accompanying definitions and context
+4. Suggested sections/timestamps for review and rationale for this recommendation
+- Review your output before finalizing to ensure you have followed these instructions exactly
+- Generate a title for the video and begin your output with the title in bold""")]
+
+def _analysis_prompt(transcript: str) -> list:
+    """Transcript part of the analysis prompt; the instructions are in ANALYSIS_SYSTEM.
+
+    The instructions alone are too short to cache, so the breakpoint goes
+    after the transcript: a regenerated analysis reads the whole prefix from
+    the prompt cache.
+    """
+    return [cached_block(f"Transcript:\n{transcript}")]
+
 @router.post("/analyze-transcript")
-async def analyze_transcript(request: TranscriptAnalysisRequest):
+async def analyze_transcript(request: TranscriptAnalysisRequest, http_request: Request):
     """Analyze video transcript for structure and key points"""
     try:
-        response = anthropic_client.messages.create(
-            model=CLAUDE_MODEL,
-            max_tokens=MAX_TOKENS_ANALYSIS,
-            messages=[{
-                "role": "user",
-                "content": f"""Analyze this video transcript and provide:
-                
-                1. A high-level summary of the main topics in bullet points
-                2. Key points and takeaways, comprehensive (bullet points)
-                3. Any important technical terms or concepts mentioned, with accompanying definitions and context
-                4. Suggested sections/timestamps for review and rationale for this recommendation
-                - Review your output before finalizing to ensure you have followed these instructions exactly
-                - Generate a title for the video and begin your output with the title in bold
-
-                Transcript:
-                {request.transcript}
-                """
-            }]
+        analysis = await llm_client.complete(
+            _analysis_prompt(request.transcript),
+            CLAUDE_MODEL,
+            MAX_TOKENS_ANALYSIS,
+            system=ANALYSIS_SYSTEM,
+            regenerate=request.regenerate,
+            is_disconnected=http_request.is_disconnected
         )
-        
-        analysis = response.content[0].text.strip()
         return {"analysis": analysis}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Analysis error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/analyze-transcript/stream")
+async def analyze_transcript_stream(request: TranscriptAnalysisRequest):
+    """Server-sent events variant of /analyze-transcript"""
+    return sse_response(
+        llm_client.stream(
+            _analysis_prompt(request.transcript), CLAUDE_MODEL, MAX_TOKENS_ANALYSIS,
+            system=ANALYSIS_SYSTEM, regenerate=request.regenerate
+        )
+    )
+
+@router.get("/llm-stats")
+async def llm_stats():
+    """Report Claude call counts, latency, token usage (prompt cache included) and response cache hit ratios"""
+    return {"client": llm_client.stats(), "cache": llm_cache.stats()}
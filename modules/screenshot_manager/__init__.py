@@ -1,98 +1,459 @@
 from fastapi import HTTPException
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+import asyncio
 import base64
 import io
-from PIL import Image, ImageDraw, ImageFont
-from datetime import datetime, timedelta
+from PIL import Image
+from typing import Optional, Tuple, Union
+import hashlib
+import multiprocessing
+import os
 import re
+import time
 import logging
 
+from .encoding import (
+    DEFAULT_ENCODING_PROFILE, EXTENSION_MIME_TYPES, FORMAT_EXTENSIONS, FORMAT_MIME_TYPES,
+    encode_image, resolve_profile
+)
+from .label_renderer import get_label_renderer
+from .layout import FILENAME_PATTERN, sharded_path, video_dir, video_id_from_name
+from .metadata_index import ScreenshotIndex
+from .perceptual_hash import HASH_FUNCTIONS, FrameSimilarityIndex
+from modules.file_serving import file_version
+from modules.single_flight import SingleFlight
+from modules.storage_writer import StorageWriter, write_atomic
+
 logger = logging.getLogger(__name__)
 
+# Smaller copies for galleries, keyed by the name used in ?derivative=
+DERIVATIVE_WIDTHS = {'thumb': 320, 'preview': 640}
+DERIVATIVE_ENCODE_OPTIONS = {'quality': 75, 'method': 2}
+# File names only: no separators, no leading dot
+SCREENSHOT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9_.@-]*$")
+
 class ScreenshotManager:
-    def __init__(self, data_dir: Path, max_age_days: int = 7, max_per_video: int = 50):
+    def __init__(self, data_dir: Path, max_age_days: int = 7, max_per_video: int = 50, max_bytes: int = 0,
+                 encode_executor: str = 'thread', encode_workers: Optional[int] = None,
+                 encode_queue_size: int = 32, label_font_path: Optional[str] = None,
+                 label_cache_size: int = 64, encoding_profile: str = DEFAULT_ENCODING_PROFILE,
+                 frame_hash: str = 'dhash', storage_writer: Optional[StorageWriter] = None):
         self.screenshots_dir = data_dir / 'screenshots'
         self.screenshots_dir.mkdir(exist_ok=True)
         self.max_age_days = max_age_days
         self.max_per_video = max_per_video
+        # Total size of the store before least-recently-accessed files are evicted; 0 disables
+        self.max_bytes = max_bytes
+        # 'process' spreads encodes across cores; 'thread' avoids pickling frames
+        self.encode_executor = encode_executor
+        self.encode_workers = encode_workers
+        self.encode_queue_size = encode_queue_size
+        self.label_font_path = label_font_path
+        self.label_cache_size = label_cache_size
+        resolve_profile(encoding_profile)
+        self.encoding_profile = encoding_profile
+        # Perceptual hash stored with every frame, for near-duplicate detection
+        if frame_hash not in HASH_FUNCTIONS:
+            raise ValueError(f"Unknown frame hash: {frame_hash}")
+        self.frame_hash = frame_hash
+        self.storage_writer = storage_writer or StorageWriter()
+        self._executor = None
+        self._encode_slots: Optional[asyncio.Semaphore] = None
+        self._derivative_flights = SingleFlight()
+        # Files from before the sharded layout stay readable until migrated
+        # (tools/migrate_screenshot_layout.py)
+        self._has_flat_files = next(self.screenshots_dir.glob("yt_*"), None) is not None
+        self.index = ScreenshotIndex(data_dir / 'screenshots.db')
+        if self.index.is_new:
+            self._backfill_index()
+        self.similarity = FrameSimilarityIndex(self.index)
 
-    def cleanup_old_screenshots(self):
-        """Clean up old screenshots based on age and count limits"""
+    @staticmethod
+    def label_key(label_text: str = None, font_size: int = None, label_color: str = 'white') -> Optional[str]:
+        """Short digest identifying a label configuration, None when unlabelled"""
+        if not label_text:
+            return None
+        raw = f"{label_text}|{font_size}|{label_color}".encode('utf-8')
+        return hashlib.sha1(raw).hexdigest()[:10]
+
+    def screenshot_path(self, video_id: str, timestamp: int, label_text: str = None,
+                        font_size: int = None, label_color: str = 'white',
+                        image_format: str = 'WEBP') -> Path:
+        """Path a frame is stored at; labelled variants get their own file"""
+        label_key = self.label_key(label_text, font_size, label_color)
+        suffix = f"_{label_key}" if label_key else ""
+        name = f"yt_{video_id}_{timestamp}{suffix}{FORMAT_EXTENSIONS[image_format]}"
+        return video_dir(self.screenshots_dir, video_id) / name
+
+    def gif_path(self, video_id: str, timestamp: int) -> Path:
+        """Path a GIF is stored at, creating its directory"""
+        file_path = video_dir(self.screenshots_dir, video_id) / f"yt_{video_id}_{timestamp}.gif"
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        return file_path
+
+    def locate(self, name: str) -> Optional[Path]:
+        """Find a stored file by name in the sharded layout, or the legacy flat one"""
+        file_path = sharded_path(self.screenshots_dir, name)
+        if file_path is not None and file_path.is_file():
+            return file_path
+        # Names outside the yt_ scheme were only ever stored flat
+        if self._has_flat_files or file_path is None:
+            file_path = self.screenshots_dir / name
+            if file_path.is_file():
+                return file_path
+        return None
+
+    def find_screenshot(self, video_id: str, timestamp: int, label_text: str = None,
+                        font_size: int = None, label_color: str = 'white',
+                        image_format: Optional[str] = None) -> Optional[Path]:
+        """Locate a saved frame in whichever format it was encoded, or only in ``image_format``"""
+        for image_format in [image_format] if image_format else FORMAT_EXTENSIONS:
+            file_path = self.screenshot_path(video_id, timestamp, label_text, font_size, label_color, image_format)
+            if file_path.is_file():
+                return file_path
+            if self._has_flat_files and (self.screenshots_dir / file_path.name).is_file():
+                return self.screenshots_dir / file_path.name
+        return None
+
+    def load_saved_screenshot(self, video_id: str, timestamp: int, label_text: str = None,
+                              font_size: int = None, label_color: str = 'white',
+                              image_format: Optional[str] = None) -> Optional[str]:
+        """Return a previously saved frame as a data URL, or None if not on disk"""
+        file_path = self.find_screenshot(video_id, timestamp, label_text, font_size, label_color, image_format)
+        if file_path is None:
+            return None
         try:
-            now = datetime.now()
-            cleanup_threshold = now - timedelta(days=self.max_age_days)
-            
-            video_files = {}
-            for file_path in self.screenshots_dir.glob("yt_*"):
-                if not file_path.is_file():
-                    continue
-                    
-                match = re.match(r"yt_([^_]+)_", file_path.name)
+            return self.data_url(file_path)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def data_url(file_path: Path) -> str:
+        return _data_url(base64.b64encode(file_path.read_bytes()).decode(), EXTENSION_MIME_TYPES[file_path.suffix])
+
+    def resolve_screenshot(self, screenshot_id: str) -> Optional[Path]:
+        """Map a screenshot id (its file name) to a file in the screenshot store"""
+        if not SCREENSHOT_ID_PATTERN.match(screenshot_id) or '..' in screenshot_id:
+            return None
+        return self.locate(screenshot_id)
+
+    @staticmethod
+    def screenshot_url(file_path: Path) -> str:
+        """Versioned URL for a saved file; the version changes when it is rewritten"""
+        return f"/api/screenshots/{file_path.name}?v={file_version(file_path.stat())}"
+
+    @staticmethod
+    def derivative_path(file_path: Path, derivative: str) -> Path:
+        """Derivatives sit next to the original as {stem}@{name}.webp"""
+        return file_path.with_name(f"{file_path.stem}@{derivative}.webp")
+
+    async def get_derivative(self, file_path: Path, derivative: str) -> Path:
+        """Return a downscaled copy of a saved screenshot, rendering it on first use.
+
+        The copy is cached on disk and re-rendered if the original has been
+        rewritten since. Concurrent requests for the same copy share one render.
+        """
+        if derivative not in DERIVATIVE_WIDTHS:
+            raise ValueError(f"Unknown derivative: {derivative}")
+        target = self.derivative_path(file_path, derivative)
+        try:
+            if target.stat().st_mtime >= file_path.stat().st_mtime:
+                return target
+        except FileNotFoundError:
+            pass
+        async def render():
+            await self._run_encode_job(_render_derivative, file_path, target, DERIVATIVE_WIDTHS[derivative])
+            # Count the copies toward the byte quota alongside the original
+            self.index.set_derivative_bytes(file_path.name, self._derivative_bytes(file_path))
+
+        await self._derivative_flights.run(str(target), render)
+        return target
+
+    @staticmethod
+    def _derivative_bytes(file_path: Path) -> int:
+        total = 0
+        for derivative in DERIVATIVE_WIDTHS:
+            try:
+                total += ScreenshotManager.derivative_path(file_path, derivative).stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    @staticmethod
+    def _remove_derivatives(file_path: Path) -> int:
+        """Delete a file's derivatives, returning the bytes freed"""
+        freed = 0
+        for derivative in DERIVATIVE_WIDTHS:
+            derivative_path = ScreenshotManager.derivative_path(file_path, derivative)
+            try:
+                size = derivative_path.stat().st_size
+                derivative_path.unlink()
+                freed += size
+            except FileNotFoundError:
+                pass
+        return freed
+
+    def register_file(self, file_path: Path, video_id: str, timestamp: int, frame_hash: Optional[int] = None):
+        """Record a file written into the store (frames, GIFs) in the metadata index"""
+        if file_path.suffix in FORMAT_EXTENSIONS.values():
+            # A frame rewritten in another format replaced any older copy of it;
+            # GIFs sit beside the frame at the same timestamp and replace nothing
+            self.index.remove([
+                file_path.with_suffix(extension).name
+                for extension in FORMAT_EXTENSIONS.values() if extension != file_path.suffix
+            ])
+            # Copies of the previous version are stale; drop them so the new row's
+            # derivative_bytes (reset to 0) matches what is on disk
+            self._remove_derivatives(file_path)
+        self.index.record(file_path.name, video_id, int(timestamp), file_path.stat().st_size,
+                          frame_hash=frame_hash)
+        if frame_hash is not None:
+            self.similarity.add(video_id, frame_hash, file_path.name)
+
+    def find_duplicate(self, file_path: Path, max_distance: int) -> Optional[Tuple[int, Path]]:
+        """Nearest other saved frame of the same video within ``max_distance`` bits.
+
+        Variants of the same timestamp (other labels) don't count. Returns
+        (distance, path), or None when the frame is distinct or unhashed.
+        """
+        match = FILENAME_PATTERN.match(file_path.name)
+        frame_hash = self.index.frame_hash(file_path.name)
+        if not match or frame_hash is None:
+            return None
+        video_id, timestamp = match.group(1), match.group(2)
+        # Retry past frames whose files have gone since the tree was loaded
+        gone = set()
+
+        def excluded(name: str) -> bool:
+            return name in gone or FILENAME_PATTERN.match(name).group(2) == timestamp
+
+        while True:
+            nearest = self.similarity.nearest(video_id, frame_hash, max_distance, exclude=excluded)
+            if nearest is None:
+                return None
+            duplicate = self.locate(nearest[1])
+            if duplicate is not None:
+                return nearest[0], duplicate
+            gone.add(nearest[1])
+
+    def discard(self, file_path: Path):
+        """Delete a saved frame, e.g. one found to duplicate another"""
+        self._delete([(file_path.name, file_path.stat().st_size)])
+
+    def touch(self, file_path: Path):
+        """Note a read of a stored file for least-recently-accessed eviction"""
+        self.index.touch(file_path.name)
+
+    def _backfill_index(self):
+        """One walk of the store to index files saved before the index existed"""
+        rows = []
+        derivative_bytes = {}
+        for directory, _, names in os.walk(self.screenshots_dir):
+            for name in names:
+                match = FILENAME_PATTERN.match(name)
                 if not match:
                     continue
-                    
-                video_id = match.group(1)
-                file_stat = file_path.stat()
-                file_time = datetime.fromtimestamp(file_stat.st_mtime)
-                
-                if file_time < cleanup_threshold:
-                    file_path.unlink()
+                file_stat = os.stat(os.path.join(directory, name))
+                if match.group(3):
+                    # Derivatives are tracked through their original, which shares the stem
+                    stem = os.path.join(directory, name.split('@', 1)[0])
+                    derivative_bytes[stem] = derivative_bytes.get(stem, 0) + file_stat.st_size
                     continue
-                    
-                if video_id not in video_files:
-                    video_files[video_id] = []
-                video_files[video_id].append((file_path, file_time))
-            
-            for video_id, files in video_files.items():
-                if len(files) > self.max_per_video:
-                    sorted_files = sorted(files, key=lambda x: x[1], reverse=True)
-                    for file_path, _ in sorted_files[self.max_per_video:]:
-                        file_path.unlink()
-                        
-            return {"message": "Cleanup completed successfully"}
+                rows.append((name, match.group(1), int(match.group(2)), file_stat.st_size, file_stat.st_mtime,
+                             os.path.join(directory, os.path.splitext(name)[0])))
+        self.index.record_many(row[:5] + (derivative_bytes.get(row[5], 0),) for row in rows)
+        if rows:
+            logger.info(f"Indexed {len(rows)} existing screenshots")
+
+    def _delete(self, rows) -> dict:
+        """Delete indexed (name, size) files and their derivatives"""
+        deleted = reclaimed = 0
+        for name, size in rows:
+            file_path = self.locate(name) or sharded_path(self.screenshots_dir, name) or self.screenshots_dir / name
+            try:
+                file_path.unlink()
+                deleted += 1
+                reclaimed += size
+            except FileNotFoundError:
+                pass
+            reclaimed += self._remove_derivatives(file_path)
+            video_id = video_id_from_name(name)
+            if video_id:
+                self.similarity.forget(video_id)
+        self.index.remove(name for name, _ in rows)
+        return {"deleted": deleted, "bytes_reclaimed": reclaimed}
+
+    def cleanup_old_screenshots(self):
+        """Apply retention: age limit, per-video count limit, then the byte quota.
+
+        Blocking; run it off the event loop (see RetentionScheduler).
+        """
+        try:
+            started = time.monotonic()
+            by_reason = {
+                "expired": self._delete(self.index.created_before(time.time() - self.max_age_days * 86400)),
+                "over_video_limit": self._delete(self.index.beyond_video_limit(self.max_per_video)),
+            }
+            if self.max_bytes:
+                by_reason["over_quota"] = self._delete(self.index.beyond_byte_quota(self.max_bytes))
+            return {
+                "message": "Cleanup completed successfully",
+                "deleted": sum(result["deleted"] for result in by_reason.values()),
+                "bytes_reclaimed": sum(result["bytes_reclaimed"] for result in by_reason.values()),
+                "duration_ms": round((time.monotonic() - started) * 1000, 1),
+                "by_reason": by_reason
+            }
         except Exception as e:
             logger.error(f"Error during screenshot cleanup: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
-    def optimize_and_save_screenshot(self, image_bytes: bytes, video_id: str, timestamp: int, 
-                                   label_text: str = None, font_size: int = None, 
-                                   label_color: str = 'white'):
-        """Optimize screenshot and save to disk"""
+    def _get_executor(self):
+        if self._executor is None:
+            if self.encode_executor == 'process':
+                # Spawned, not forked: the server already runs Playwright and
+                # worker threads whose held locks a forked child would inherit.
+                # Each worker re-imports the launching script, so the server
+                # must be started via uvicorn, not `python main.py`, for this mode
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.encode_workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.encode_workers, thread_name_prefix="screenshot-encode"
+                )
+        return self._executor
+
+    async def _run_encode_job(self, fn, *args):
+        """Run an encode job off the event loop, waiting if the encode queue is full"""
+        if self._encode_slots is None:
+            self._encode_slots = asyncio.Semaphore(self.encode_queue_size)
+        async with self._encode_slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+
+    def shutdown(self):
+        """Stop the encode workers and close the metadata index"""
+        if self._executor is not None:
+            # Queued encodes are dropped; running ones finish so workers exit cleanly
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self.index.close()
+
+    async def _store(self, file_path: Path, data: bytes):
+        await self.storage_writer.write(file_path, data)
+        # A recapture in another format replaces the old copy rather than shadowing it
+        for extension in FORMAT_EXTENSIONS.values():
+            if extension != file_path.suffix:
+                file_path.with_suffix(extension).unlink(missing_ok=True)
+
+    async def save_encoded_screenshot(self, encoded_bytes: bytes, video_id: str, timestamp: int,
+                                      image_format: str = 'WEBP', hash_frame: bool = False,
+                                      inline: bool = True) -> Optional[str]:
+        """Save an unlabelled frame that is already encoded, without re-encoding it.
+
+        With ``hash_frame`` the frame is decoded in the encode executor to
+        compute its perceptual hash, so it can take part in duplicate checks;
+        otherwise it is never decoded. Returns the frame as a data URL, or
+        None without ``inline``.
+        """
         try:
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            if label_text:
-                draw = ImageDraw.Draw(image)
-                try:
-                    font = ImageFont.truetype('/System/Library/Fonts/Helvetica.ttc', font_size)
-                except:
-                    font = ImageFont.load_default()
-                
-                bbox = draw.textbbox((0, 0), label_text, font=font)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
-                
-                x = (image.width - text_width) // 2
-                y = image.height // 4 - text_height // 2
-                
-                outline_width = max(1, font_size // 25)
-                for adj in range(-outline_width, outline_width + 1):
-                    for offy in range(-outline_width, outline_width + 1):
-                        if adj == 0 and offy == 0:
-                            continue
-                        draw.text((x + adj, y + offy), label_text, font=font, fill='black')
-                draw.text((x, y), label_text, font=font, fill=label_color)
-            
-            webp_buffer = io.BytesIO()
-            image.save(webp_buffer, 'WEBP', quality=80, method=6)
-            optimized_bytes = webp_buffer.getvalue()
+            file_path = self.screenshot_path(video_id, timestamp, image_format=image_format)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            if hash_frame:
+                frame_hash, _ = await asyncio.gather(
+                    self._run_encode_job(_hash_encoded, encoded_bytes, self.frame_hash),
+                    self._store(file_path, encoded_bytes)
+                )
+            else:
+                await self._store(file_path, encoded_bytes)
+                frame_hash = None
+            self.register_file(file_path, video_id, timestamp, frame_hash)
+            return _encoded_data_url(encoded_bytes, image_format) if inline else None
             
-            file_path = self.screenshots_dir / f"yt_{video_id}_{timestamp}.webp"
-            with open(file_path, "wb") as f:
-                f.write(optimized_bytes)
-            
-            return base64.b64encode(optimized_bytes).decode()
+        except Exception as e:
+            logger.error(f"Error saving encoded screenshot: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    async def optimize_and_save_screenshot(self, image_bytes: Union[bytes, Image.Image], video_id: str, timestamp: int, 
+                                   label_text: str = None, font_size: int = None, 
+                                   label_color: str = 'white', encoding_profile: Optional[str] = None,
+                                   hash_frame: bool = False, inline: bool = True) -> Optional[str]:
+        """Optimize screenshot and save to disk, returning it as a data URL (None without ``inline``).
+
+        Accepts encoded image bytes or an already decoded PIL image, so
+        backends that decode frames themselves skip a round trip. Decoding,
+        labelling and encoding run in the encode executor and the file is
+        written atomically by the storage writer, so neither blocks the event
+        loop. ``encoding_profile`` overrides the deployment's default profile
+        for this frame; ``hash_frame`` also records its perceptual hash for
+        duplicate checks.
+        """
+        try:
+            image_format, options = resolve_profile(encoding_profile or self.encoding_profile)
+            file_path = self.screenshot_path(video_id, timestamp, label_text, font_size, label_color, image_format)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            data, frame_hash = await self._run_encode_job(
+                _optimize, image_bytes, label_text, font_size, label_color,
+                self.label_font_path, self.label_cache_size, image_format, options,
+                self.frame_hash if hash_frame else None
+            )
+            await self._store(file_path, data)
+            self.register_file(file_path, video_id, timestamp, frame_hash)
+            return _encoded_data_url(data, image_format) if inline else None
             
         except Exception as e:
             logger.error(f"Error optimizing/saving screenshot: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
+
+
+def _data_url(encoded: str, mime_type: str) -> str:
+    return f"data:{mime_type};base64,{encoded}"
+
+
+def _encoded_data_url(data: bytes, image_format: str) -> str:
+    return _data_url(base64.b64encode(data).decode(), FORMAT_MIME_TYPES[image_format])
+
+
+def _hash_encoded(data: bytes, frame_hash: str = 'dhash') -> int:
+    """Perceptual hash of an already encoded frame; runs in the encode executor"""
+    with Image.open(io.BytesIO(data)) as image:
+        return HASH_FUNCTIONS[frame_hash](image)
+
+
+def _optimize(image_bytes: Union[bytes, Image.Image], label_text: str = None, font_size: int = None,
+              label_color: str = 'white', label_font_path: Optional[str] = None,
+              label_cache_size: int = 64, image_format: str = 'WEBP',
+              encode_options: Optional[dict] = None,
+              frame_hash: Optional[str] = 'dhash') -> Tuple[bytes, Optional[int]]:
+    """Encode pipeline run inside the encode executor; must stay a picklable top-level function.
+
+    Returns the encoded bytes and the frame's perceptual hash (None when
+    ``frame_hash`` is None). Base64 for inline responses is left to the
+    caller, so it isn't built or sent back from a worker unless needed.
+    """
+    if isinstance(image_bytes, Image.Image):
+        image = image_bytes
+    else:
+        image = Image.open(io.BytesIO(image_bytes))
+    # Hash before labelling so an overlay doesn't hide or fake a match
+    hashed = HASH_FUNCTIONS[frame_hash](image) if frame_hash else None
+    
+    if label_text:
+        image = get_label_renderer(label_font_path, label_cache_size).apply(
+            image, label_text, font_size, label_color
+        )
+    
+    encoded = encode_image(image, image_format, encode_options or {'quality': 80, 'method': 2})
+    return encoded, hashed
+
+
+def _render_derivative(file_path: Path, target: Path, width: int):
+    """Downscale a saved screenshot to ``width`` pixels wide; runs in the encode executor"""
+    with Image.open(file_path) as image:
+        image.load()
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        encoded = encode_image(image, 'WEBP', DERIVATIVE_ENCODE_OPTIONS)
+    # Derivatives can be re-rendered, so skip the fsync
+    write_atomic(target, encoded)
@@ -0,0 +1,51 @@
+from typing import Dict, List, Tuple
+from PIL import Image
+import io
+
+# Each profile lists candidate encodings in order of preference; the first
+# format this Pillow build can write is used. On 1280x720 frames WEBP method 2
+# encodes about 3x faster than method 6 for ~3% more bytes, and method 0 at
+# quality 75 about 5x faster at a similar size (see benchmarks/encode_profiles.py).
+ENCODING_PROFILES: Dict[str, List[Tuple[str, dict]]] = {
+    'fast-preview': [
+        ('WEBP', {'quality': 75, 'method': 0}),
+    ],
+    'balanced': [
+        ('WEBP', {'quality': 80, 'method': 2}),
+    ],
+    'archival': [
+        ('AVIF', {'quality': 60, 'speed': 6}),
+        ('WEBP', {'quality': 85, 'method': 6}),
+    ],
+    'jpeg': [
+        ('JPEG', {'quality': 85, 'optimize': False, 'progressive': False}),
+    ],
+}
+DEFAULT_ENCODING_PROFILE = 'balanced'
+
+FORMAT_EXTENSIONS = {'WEBP': '.webp', 'AVIF': '.avif', 'JPEG': '.jpg'}
+FORMAT_MIME_TYPES = {'WEBP': 'image/webp', 'AVIF': 'image/avif', 'JPEG': 'image/jpeg'}
+EXTENSION_MIME_TYPES = {FORMAT_EXTENSIONS[name]: mime for name, mime in FORMAT_MIME_TYPES.items()}
+
+
+def format_available(image_format: str) -> bool:
+    Image.init()
+    return image_format in Image.SAVE
+
+
+def resolve_profile(profile: str) -> Tuple[str, dict]:
+    """Pick the (format, save options) a profile encodes with on this build"""
+    if profile not in ENCODING_PROFILES:
+        raise ValueError(f"Unknown encoding profile: {profile}")
+    for image_format, options in ENCODING_PROFILES[profile]:
+        if format_available(image_format):
+            return image_format, options
+    raise ValueError(f"No format of encoding profile {profile} is supported by this Pillow build")
+
+
+def encode_image(image: Image.Image, image_format: str, options: dict) -> bytes:
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
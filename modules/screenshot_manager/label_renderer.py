@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from PIL import Image, ImageDraw, ImageFont
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tried in order after the configured font; covers Debian/Ubuntu images and macOS
+FALLBACK_FONT_PATHS = (
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
+    '/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf',
+    '/usr/share/fonts/TTF/DejaVuSans-Bold.ttf',
+    '/System/Library/Fonts/Helvetica.ttc',
+)
+
+
+class LabelRenderer:
+    """Renders outlined label text once and stamps it onto frames.
+
+    Fonts are loaded once per size, and each (text, font_size, color) label
+    is drawn a single time into a transparent RGBA overlay kept in an LRU
+    cache, so a burst of frames with the same label pays for text layout
+    and the outline only once.
+    """
+
+    def __init__(self, font_path: Optional[str] = None, cache_size: int = 64):
+        self.font_paths = ((font_path,) if font_path else ()) + FALLBACK_FONT_PATHS
+        self.cache_size = cache_size
+        self._fonts: Dict[int, ImageFont.ImageFont] = {}
+        self._overlays: "OrderedDict[Tuple[str, int, str], Tuple[Image.Image, int, int, int, int]]" = OrderedDict()
+
+    def font(self, font_size: int) -> ImageFont.ImageFont:
+        font = self._fonts.get(font_size)
+        if font is None:
+            for path in self.font_paths:
+                try:
+                    font = ImageFont.truetype(path, font_size)
+                    break
+                except OSError:
+                    continue
+            else:
+                logger.warning(f"No TrueType font found in {self.font_paths}, using default font")
+                try:
+                    font = ImageFont.load_default(size=font_size)
+                except TypeError:
+                    # Pillow < 10.1 only has the fixed-size bitmap font
+                    font = ImageFont.load_default()
+            self._fonts[font_size] = font
+        return font
+
+    def overlay(self, text: str, font_size: int, color: str = 'white'):
+        """Return (overlay, left, top, text_width, text_height) for a label.
+
+        ``left``/``top`` are the offsets of the overlay's corner from the text
+        origin, so it lands exactly where drawing the text would put it.
+        """
+        key = (text, font_size, color)
+        cached = self._overlays.get(key)
+        if cached:
+            self._overlays.move_to_end(key)
+            return cached
+
+        font = self.font(font_size)
+        outline_width = max(1, font_size // 25)
+        bbox = ImageDraw.Draw(Image.new('RGBA', (1, 1))).textbbox(
+            (0, 0), text, font=font, stroke_width=outline_width
+        )
+        overlay = Image.new('RGBA', (bbox[2] - bbox[0], bbox[3] - bbox[1]), (0, 0, 0, 0))
+        ImageDraw.Draw(overlay).text(
+            (-bbox[0], -bbox[1]), text, font=font, fill=color,
+            stroke_width=outline_width, stroke_fill='black'
+        )
+
+        # Centre on the text itself, not the outline, like the original layout
+        text_bbox = ImageDraw.Draw(Image.new('RGBA', (1, 1))).textbbox((0, 0), text, font=font)
+        cached = (overlay, bbox[0], bbox[1], text_bbox[2] - text_bbox[0], text_bbox[3] - text_bbox[1])
+        self._overlays[key] = cached
+        while len(self._overlays) > self.cache_size:
+            self._overlays.popitem(last=False)
+        return cached
+
+    def apply(self, image: Image.Image, text: str, font_size: int, color: str = 'white') -> Image.Image:
+        """Composite a label centred horizontally a quarter of the way down the frame"""
+        overlay, left, top, text_width, text_height = self.overlay(text, font_size, color)
+        x = (image.width - text_width) // 2
+        y = image.height // 4 - text_height // 2
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        image.paste(overlay, (x + left, y + top), overlay)
+        return image
+
+
+_renderers: Dict[Tuple[Optional[str], int], LabelRenderer] = {}
+
+
+def get_label_renderer(font_path: Optional[str] = None, cache_size: int = 64) -> LabelRenderer:
+    """Per-process shared renderer, so encode workers keep their caches between jobs"""
+    key = (font_path, cache_size)
+    renderer = _renderers.get(key)
+    if renderer is None:
+        renderer = _renderers[key] = LabelRenderer(font_path, cache_size)
+    return renderer
@@ -0,0 +1,40 @@
+from pathlib import Path
+from typing import Optional
+import hashlib
+import re
+
+# Files live at {root}/{bucket}/{video_id}/{name}, where bucket is the first
+# two hex digits of sha1(video_id): at most 256 top-level directories, and
+# each video's files in a directory of their own.
+BUCKET_CHARS = 2
+VIDEO_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+# yt_{video_id}_{timestamp}[_{label_key}][@{derivative}].{ext}. YouTube ids are
+# 11 characters and may contain underscores, so try that length first and
+# otherwise take the shortest id that leaves a valid remainder.
+FILENAME_PATTERN = re.compile(
+    r"^yt_([A-Za-z0-9_-]{11}|.+?)_(\d+)(?:_[0-9a-f]{10})?(@[a-z]+)?\.[a-z]+$"
+)
+
+
+def bucket_for(video_id: str) -> str:
+    return hashlib.sha1(video_id.encode('utf-8')).hexdigest()[:BUCKET_CHARS]
+
+
+def video_dir(root: Path, video_id: str) -> Path:
+    """Directory holding one video's files"""
+    if not VIDEO_ID_PATTERN.match(video_id):
+        raise ValueError(f"Invalid video id: {video_id!r}")
+    return root / bucket_for(video_id) / video_id
+
+
+def video_id_from_name(name: str) -> Optional[str]:
+    match = FILENAME_PATTERN.match(name)
+    return match.group(1) if match else None
+
+
+def sharded_path(root: Path, name: str) -> Optional[Path]:
+    """Where a store file of this name belongs, or None for foreign names"""
+    video_id = video_id_from_name(name)
+    if video_id is None or not VIDEO_ID_PATTERN.match(video_id):
+        return None
+    return video_dir(root, video_id) / name
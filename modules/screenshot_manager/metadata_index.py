@@ -0,0 +1,161 @@
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS screenshots (
+    name TEXT PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    frame_hash TEXT,
+    derivative_bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS screenshots_video_created ON screenshots (video_id, created DESC);
+CREATE INDEX IF NOT EXISTS screenshots_created ON screenshots (created);
+CREATE INDEX IF NOT EXISTS screenshots_last_access ON screenshots (last_access);
+"""
+
+# Reads bump last_access at most this often per file, to keep reads mostly write-free
+TOUCH_INTERVAL_SECONDS = 60
+
+
+class ScreenshotIndex:
+    """SQLite (WAL mode) index of the files in the screenshot store.
+
+    Rows are keyed by file name relative to the store and kept current on
+    every write and delete, so retention can find expired or surplus files
+    with indexed queries instead of listing and stat-ing the directory.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL only fsyncs at checkpoints; a crash can lose the last
+        # few rows, which the next backfill or cleanup tolerates
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            existed = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='screenshots'"
+            ).fetchone()
+            self._conn.executescript(SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(screenshots)")}
+            if "frame_hash" not in columns:
+                self._conn.execute("ALTER TABLE screenshots ADD COLUMN frame_hash TEXT")
+            if "derivative_bytes" not in columns:
+                self._conn.execute("ALTER TABLE screenshots ADD COLUMN derivative_bytes INTEGER NOT NULL DEFAULT 0")
+        self.is_new = existed is None
+
+    def record(self, name: str, video_id: str, timestamp: int, size: int, created: Optional[float] = None,
+               frame_hash: Optional[int] = None):
+        """Insert or replace a file's row after it has been written"""
+        created = created or time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO screenshots (name, video_id, timestamp, size, created, last_access, frame_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (name, video_id, timestamp, size, created, created,
+                 f"{frame_hash:016x}" if frame_hash is not None else None)
+            )
+
+    def record_many(self, rows: Iterable[tuple]):
+        """Bulk insert (name, video_id, timestamp, size, created, derivative_bytes) rows"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO screenshots "
+                "(name, video_id, timestamp, size, created, derivative_bytes, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (row + (row[4],) for row in rows)
+            )
+            self._conn.execute("COMMIT")
+
+    def frame_hashes(self, video_id: str) -> List[Tuple[str, str]]:
+        """(name, hex frame hash) of a video's hashed frames"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT name, frame_hash FROM screenshots WHERE video_id = ? AND frame_hash IS NOT NULL",
+                (video_id,)
+            ).fetchall()
+
+    def frame_hash(self, name: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute("SELECT frame_hash FROM screenshots WHERE name = ?", (name,)).fetchone()
+        return int(row[0], 16) if row and row[0] else None
+
+    def set_derivative_bytes(self, name: str, derivative_bytes: int):
+        """Disk used by a file's rendered derivatives, counted toward the byte quota with it"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE screenshots SET derivative_bytes = ? WHERE name = ?", (derivative_bytes, name)
+            )
+
+    def touch(self, name: str, now: Optional[float] = None):
+        now = now or time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE screenshots SET last_access = ? WHERE name = ? AND last_access < ?",
+                (now, name, now - TOUCH_INTERVAL_SECONDS)
+            )
+
+    def remove(self, names: Iterable[str]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM screenshots WHERE name = ?", ((name,) for name in names))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM screenshots")
+
+    def created_before(self, cutoff: float) -> List[Tuple[str, int]]:
+        """(name, size) of files created before ``cutoff``"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT name, size FROM screenshots WHERE created < ?", (cutoff,)
+            ).fetchall()
+
+    def beyond_video_limit(self, max_per_video: int) -> List[Tuple[str, int]]:
+        """(name, size) of files past the newest ``max_per_video`` of their video"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT name, size FROM ("
+                "  SELECT name, size, ROW_NUMBER() OVER (PARTITION BY video_id ORDER BY created DESC) AS rank"
+                "  FROM screenshots"
+                ") WHERE rank > ?",
+                (max_per_video,)
+            ).fetchall()
+
+    def beyond_byte_quota(self, max_bytes: int) -> List[Tuple[str, int]]:
+        """(name, size) of the least recently accessed files that don't fit in ``max_bytes``.
+
+        A file's derivatives count toward the quota with it and are deleted with it.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT name, size FROM ("
+                "  SELECT name, size,"
+                "    SUM(size + derivative_bytes) OVER (ORDER BY last_access DESC, name) AS kept"
+                "  FROM screenshots"
+                ") WHERE kept > ?",
+                (max_bytes,)
+            ).fetchall()
+
+    def stats(self) -> dict:
+        with self._lock:
+            files, total_bytes, videos = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size + derivative_bytes), 0), COUNT(DISTINCT video_id) "
+                "FROM screenshots"
+            ).fetchone()
+        return {"files": files, "bytes": total_bytes, "videos": videos}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
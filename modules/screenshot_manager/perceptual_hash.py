@@ -0,0 +1,148 @@
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from PIL import Image
+import threading
+import numpy as np
+
+HASH_SIZE = 8
+
+
+def _pack_bits(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def dhash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """Difference hash: sign of horizontal gradients on a tiny grayscale copy"""
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR, reducing_gap=2.0)
+    pixels = np.asarray(small, dtype=np.int16)
+    return _pack_bits((pixels[:, 1:] > pixels[:, :-1]).ravel())
+
+
+_dct_matrices: Dict[int, np.ndarray] = {}
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    matrix = _dct_matrices.get(n)
+    if matrix is None:
+        k = np.arange(n)
+        matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2 / n)
+        matrix[0] /= np.sqrt(2)
+        _dct_matrices[n] = matrix
+    return matrix
+
+
+def phash(image: Image.Image, hash_size: int = HASH_SIZE, highfreq_factor: int = 4) -> int:
+    """DCT hash: low-frequency coefficients compared with their median"""
+    size = hash_size * highfreq_factor
+    small = image.convert('L').resize((size, size), Image.BILINEAR, reducing_gap=2.0)
+    pixels = np.asarray(small, dtype=np.float64)
+    dct = _dct_matrix(size)
+    low = (dct @ pixels @ dct.T)[:hash_size, :hash_size]
+    return _pack_bits((low > np.median(low)).ravel())
+
+
+HASH_FUNCTIONS: Dict[str, Callable[[Image.Image], int]] = {'dhash': dhash, 'phash': phash}
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """Burkhard-Keller tree over Hamming distance for near-duplicate lookups"""
+
+    def __init__(self):
+        # Node: [hash, item, {distance: child}]
+        self._root: Optional[list] = None
+        self.items = set()
+
+    def add(self, frame_hash: int, item: str):
+        self.items.add(item)
+        if self._root is None:
+            self._root = [frame_hash, item, {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(frame_hash, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [frame_hash, item, {}]
+                return
+            node = child
+
+    def search(self, frame_hash: int, max_distance: int) -> List[Tuple[int, str]]:
+        """All (distance, item) within ``max_distance``, nearest first"""
+        found = []
+        stack = [self._root] if self._root else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(frame_hash, node[0])
+            if distance <= max_distance:
+                found.append((distance, node[1]))
+            # Triangle inequality: only subtrees in this band can hold matches
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return sorted(found)
+
+
+class FrameSimilarityIndex:
+    """Per-video BK-trees of frame hashes, loaded lazily from the metadata index.
+
+    Trees have no delete, so a video's tree is dropped whenever one of its
+    frames is removed and rebuilt from the metadata index on next use.
+    """
+
+    def __init__(self, metadata_index, max_videos: int = 256):
+        self.metadata_index = metadata_index
+        self.max_videos = max_videos
+        self._trees: "OrderedDict[str, BKTree]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.duplicates = 0
+
+    def _tree(self, video_id: str) -> BKTree:
+        with self._lock:
+            tree = self._trees.get(video_id)
+            if tree is not None:
+                self._trees.move_to_end(video_id)
+                return tree
+        tree = BKTree()
+        for name, frame_hash in self.metadata_index.frame_hashes(video_id):
+            tree.add(int(frame_hash, 16), name)
+        with self._lock:
+            self._trees[video_id] = tree
+            while len(self._trees) > self.max_videos:
+                self._trees.popitem(last=False)
+        return tree
+
+    def add(self, video_id: str, frame_hash: int, name: str):
+        with self._lock:
+            tree = self._trees.get(video_id)
+            if tree is not None and name in tree.items:
+                # A recapture changed this frame's hash; rebuild on next use
+                del self._trees[video_id]
+                return
+        if tree is not None:
+            tree.add(frame_hash, name)
+
+    def forget(self, video_id: str):
+        with self._lock:
+            self._trees.pop(video_id, None)
+
+    def nearest(self, video_id: str, frame_hash: int, max_distance: int,
+                exclude: Optional[Callable[[str], bool]] = None) -> Optional[Tuple[int, str]]:
+        """Closest frame of the video within ``max_distance``, as (distance, name)"""
+        self.queries += 1
+        for distance, name in self._tree(video_id).search(frame_hash, max_distance):
+            if exclude is None or not exclude(name):
+                self.duplicates += 1
+                return distance, name
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "videos_loaded": len(self._trees),
+            "queries": self.queries,
+            "duplicates": self.duplicates,
+        }
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import time
+
+
+class KeyReuseError(Exception):
+    """A key already in use was run again with a different fingerprint"""
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one shared future.
+
+    With ``result_ttl`` set, successful results are also remembered for that
+    many seconds so a retried request with the same key gets the same answer.
+    The shared work is shielded, so one caller disconnecting doesn't cancel
+    it for the others. A ``fingerprint`` ties a key to the call it was first
+    used for; reusing the key with a different fingerprint raises
+    KeyReuseError instead of returning the other call's result.
+    """
+
+    def __init__(self, result_ttl: float = 0, max_results: int = 1024):
+        self.result_ttl = result_ttl
+        self.max_results = max_results
+        self._inflight: Dict[Hashable, Tuple[asyncio.Future, Optional[str]]] = {}
+        self._results: "OrderedDict[Hashable, Tuple[float, Optional[str], Any]]" = OrderedDict()
+        self.calls = 0
+        self.coalesced = 0
+        self.replayed = 0
+
+    def _remember(self, key: Hashable, task: asyncio.Future, fingerprint: Optional[str]):
+        self._inflight.pop(key, None)
+        if self.result_ttl and not task.cancelled() and task.exception() is None:
+            self._results[key] = (time.monotonic(), fingerprint, task.result())
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]],
+                  fingerprint: Optional[str] = None) -> Any:
+        cached = self._results.get(key)
+        if cached:
+            if time.monotonic() - cached[0] < self.result_ttl:
+                if cached[1] != fingerprint:
+                    raise KeyReuseError(key)
+                self.replayed += 1
+                return cached[2]
+            del self._results[key]
+
+        inflight = self._inflight.get(key)
+        if inflight:
+            task, first_fingerprint = inflight
+            if first_fingerprint != fingerprint:
+                raise KeyReuseError(key)
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = (task, fingerprint)
+            task.add_done_callback(lambda done: self._remember(key, done, fingerprint))
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "replayed": self.replayed,
+        }
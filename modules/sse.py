@@ -0,0 +1,33 @@
+from typing import AsyncIterator, Tuple
+from fastapi.responses import StreamingResponse
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events: AsyncIterator[Tuple[str, dict]]) -> StreamingResponse:
+    """Server-sent events from (event, data) pairs.
+
+    An exception while streaming is sent as a final ``error`` event, since
+    the status code has already gone out with the first event.
+    """
+    async def stream():
+        try:
+            async for event, data in events:
+                yield format_event(event, data)
+        except Exception as e:
+            logger.error(f"Event stream failed: {str(e)}")
+            detail = getattr(e, "detail", None) or str(e)
+            yield format_event("error", {"detail": detail})
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # Proxies must pass events through as they are written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
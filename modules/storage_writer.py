@@ -0,0 +1,132 @@
+from collections import deque
+from pathlib import Path
+from typing import Callable, Optional, Set, Union
+import aiofiles
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+def _temp_path(path: Path) -> Path:
+    # Same directory so the rename stays on one filesystem; the leading dot
+    # keeps half-written files out of store listings and id lookups
+    return path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+
+
+def _fsync_dir(directory: Path):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        # Some filesystems and platforms can't fsync a directory
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path: Path, data: bytes, fsync: bool = False):
+    """Blocking write-then-rename, for code already running in a worker"""
+    temp = _temp_path(path)
+    try:
+        with open(temp, "wb") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp, path)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+    if fsync:
+        _fsync_dir(path.parent)
+
+
+def _commit(temp: Path, path: Path, fileno: Optional[int]):
+    if fileno is not None:
+        os.fsync(fileno)
+    os.replace(temp, path)
+    if fileno is not None:
+        _fsync_dir(path.parent)
+
+
+class StorageWriter:
+    """Async atomic file writes: a temp file beside the target, fsync, then rename.
+
+    Readers and a crash only ever see the old file or the complete new one.
+    ``write_later`` runs the write in the background so a handler can
+    respond first; ``flush`` waits for those on shutdown.
+    """
+
+    def __init__(self, fsync: bool = True, latency_samples: int = 512):
+        self.fsync = fsync
+        self._pending: Set[asyncio.Task] = set()
+        self._latencies = deque(maxlen=latency_samples)
+        self.writes = 0
+        self.deferred = 0
+        self.failures = 0
+        self.bytes_written = 0
+
+    async def write(self, path: Path, data: Union[bytes, str], encoding: str = "utf-8"):
+        if isinstance(data, str):
+            data = data.encode(encoding)
+        started = time.perf_counter()
+        temp = _temp_path(path)
+        try:
+            async with aiofiles.open(temp, "wb") as f:
+                await f.write(data)
+                await f.flush()
+                await asyncio.to_thread(_commit, temp, path, f.fileno() if self.fsync else None)
+        except BaseException:
+            self.failures += 1
+            await asyncio.to_thread(temp.unlink, missing_ok=True)
+            raise
+        self._latencies.append(time.perf_counter() - started)
+        self.writes += 1
+        self.bytes_written += len(data)
+
+    def write_later(self, path: Path, data: Union[bytes, str],
+                    on_written: Optional[Callable[[], None]] = None) -> asyncio.Task:
+        """Start a write without waiting for it; ``on_written`` runs once it lands"""
+        self.deferred += 1
+        task = asyncio.create_task(self._write_later(path, data, on_written))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    async def _write_later(self, path: Path, data: Union[bytes, str], on_written):
+        try:
+            await self.write(path, data)
+            if on_written:
+                on_written()
+        except Exception as e:
+            logger.error(f"Deferred write to {path} failed: {str(e)}")
+
+    async def flush(self):
+        """Wait for deferred writes still in flight"""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+
+        return {
+            "fsync": self.fsync,
+            "writes": self.writes,
+            "deferred": self.deferred,
+            "pending": len(self._pending),
+            "failures": self.failures,
+            "bytes_written": self.bytes_written,
+            "latency_ms": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)},
+        }
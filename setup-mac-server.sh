@@ -102,7 +102,7 @@ module.exports = {
   apps : [{
     name: "youtube-notes-backend",
     script: "python",
-    args: "main.py",
+    args: "-m uvicorn main:app --host 0.0.0.0 --port $BACKEND_PORT",
     env: {
       PORT: "$BACKEND_PORT",
       NODE_ENV: "production"
@@ -0,0 +1,47 @@
+import asyncio
+
+from modules.embed_page_cache import EmbedPageCache
+
+
+class FakeSlot:
+    def __init__(self, pool):
+        self.pool = pool
+        self.uses = 0
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePool:
+    max_page_uses = 50
+
+    def __init__(self):
+        self.slots = []
+
+    async def new_slot(self):
+        # Yield so concurrent misses all reach new_slot before any returns
+        await asyncio.sleep(0.01)
+        slot = FakeSlot(self)
+        self.slots.append(slot)
+        return slot
+
+    def owns(self, slot):
+        return not slot.closed
+
+    def open_slots(self):
+        return [slot for slot in self.slots if not slot.closed]
+
+
+def test_concurrent_misses_share_one_page():
+    async def run():
+        pool = FakePool()
+        cache = EmbedPageCache(pool, max_pages=4)
+        entries = await asyncio.gather(*(cache._entry_for("abc") for _ in range(3)))
+        assert all(entry is entries[0] for entry in entries)
+        assert len(pool.open_slots()) == 1
+
+        await cache.stop()
+        assert pool.open_slots() == []
+
+    asyncio.run(run())
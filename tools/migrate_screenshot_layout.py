@@ -0,0 +1,68 @@
+"""Move a flat screenshot store into the sharded layout.
+
+Usage:
+    python tools/migrate_screenshot_layout.py [--data-dir data] [--dry-run]
+
+Each file is moved with an atomic rename, so the migration can be stopped
+at any point and simply run again to resume; files already in place are
+skipped. It is safe to run while the server is up: lookups fall back to
+the flat location until a file has moved. Files whose names aren't part
+of the yt_ scheme are left where they are.
+"""
+from pathlib import Path
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.screenshot_manager.layout import sharded_path  # noqa: E402
+
+
+def migrate(screenshots_dir: Path, dry_run: bool = False, progress_every: int = 10000) -> dict:
+    counts = {"moved": 0, "replaced_stale": 0, "skipped": 0}
+    started = time.monotonic()
+    with os.scandir(screenshots_dir) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            target = sharded_path(screenshots_dir, entry.name)
+            if target is None:
+                counts["skipped"] += 1
+                continue
+            if dry_run:
+                counts["moved"] += 1
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if target.exists():
+                # Written by the server after the switch, so the flat copy is older
+                os.unlink(entry.path)
+                counts["replaced_stale"] += 1
+            else:
+                os.replace(entry.path, target)
+                counts["moved"] += 1
+            done = counts["moved"] + counts["replaced_stale"]
+            if done % progress_every == 0:
+                print(f"  {done} files migrated ({time.monotonic() - started:.1f}s)")
+    counts["seconds"] = round(time.monotonic() - started, 1)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', type=Path, default=Path('data'), help='directory holding screenshots/')
+    parser.add_argument('--dry-run', action='store_true', help='count files that would move')
+    args = parser.parse_args()
+
+    screenshots_dir = args.data_dir / 'screenshots'
+    if not screenshots_dir.is_dir():
+        sys.exit(f"No screenshot store at {screenshots_dir}")
+    print(f"Migrating {screenshots_dir}{' (dry run)' if args.dry_run else ''}")
+    counts = migrate(screenshots_dir, args.dry_run)
+    print(f"Done: {counts['moved']} moved, {counts['replaced_stale']} stale flat copies removed, "
+          f"{counts['skipped']} unrecognised files left in place, {counts['seconds']}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""Local stand-in for the Anthropic Messages API, for running the Claude routes offline.
+
+Usage:
+    python tools/stub_anthropic_server.py [--port 8765] [--delay 0.5] [--jitter 0.5] [--fail-rate 0]
+                                         [--token-interval 0.02]
+
+Then start the server with ANTHROPIC_BASE_URL=http://127.0.0.1:8765 (any
+ANTHROPIC_API_KEY will do). POST /v1/messages answers every request with a
+canned structured caption after ``delay`` plus up to ``jitter`` seconds,
+so batch captioning and timeouts can be exercised without an API key.
+Requests with "stream": true get the reply as server-sent events, one word
+every ``--token-interval`` seconds. ``--fail-rate`` makes that fraction of
+requests fail with a 529. Prompt caching is mimicked per process: the
+prefix up to the last ``cache_control`` block is reported as cache
+creation the first time it is seen and as a cache read afterwards (one
+token per word, with no minimum length).
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import threading
+import time
+
+_ids = itertools.count(1)
+_ids_lock = threading.Lock()
+_cached_prefixes = set()
+
+
+def _blocks(content) -> list:
+    if isinstance(content, str):
+        return [{"type": "text", "text": content}]
+    return list(content or [])
+
+
+def _prompt_blocks(body: dict) -> list:
+    """System then message blocks, in the order the prompt cache sees them"""
+    blocks = _blocks(body.get("system"))
+    for message in body.get("messages", []):
+        blocks.extend(_blocks(message.get("content")))
+    return blocks
+
+
+def _prompt_text(body: dict) -> str:
+    return "\n".join(block.get("text", "") for block in _prompt_blocks(body))
+
+
+def _usage(body: dict, text: str) -> dict:
+    blocks = _prompt_blocks(body)
+    breakpoint = max((i + 1 for i, block in enumerate(blocks) if block.get("cache_control")), default=0)
+    prefix = "\n".join(block.get("text", "") for block in blocks[:breakpoint])
+    prefix_tokens = len(prefix.split())
+    cache_read = cache_creation = 0
+    if prefix_tokens:
+        digest = hashlib.sha256(f"{body.get('model')}\n{prefix}".encode("utf-8")).hexdigest()
+        with _ids_lock:
+            if digest in _cached_prefixes:
+                cache_read = prefix_tokens
+            else:
+                _cached_prefixes.add(digest)
+                cache_creation = prefix_tokens
+    return {
+        "input_tokens": sum(len(block.get("text", "").split()) for block in blocks[breakpoint:]),
+        "output_tokens": len(text.split()),
+        "cache_read_input_tokens": cache_read,
+        "cache_creation_input_tokens": cache_creation,
+    }
+
+
+def _reply_text(prompt: str) -> str:
+    words = len(prompt.split())
+    return (
+        "TOPIC HEADING: Stub caption\n\n"
+        f"CONTEXT: Generated offline from a {words}-word prompt.\n\n"
+        "KEY POINTS:\n• First key point\n• Second key point\n• Third key point"
+    )
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    delay = 0.5
+    jitter = 0.5
+    fail_rate = 0.0
+    token_interval = 0.02
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/v1/messages":
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.delay + random.random() * self.jitter)
+        if random.random() < self.fail_rate:
+            self._send_json(529, {"type": "error", "error": {"type": "overloaded_error", "message": "Stub overload"}})
+            return
+
+        text = _reply_text(_prompt_text(body))
+        with _ids_lock:
+            message_id = f"msg_stub_{next(_ids)}"
+        usage = _usage(body, text)
+        message = {
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "stub"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": usage,
+        }
+        if body.get("stream"):
+            self._stream(message, text)
+        else:
+            self._send_json(200, message)
+
+    def _send_event(self, event: str, data: dict):
+        self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _stream(self, message: dict, text: str):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        usage = message["usage"]
+        self._send_event("message_start", {"type": "message_start", "message": {
+            **message, "content": [], "stop_reason": None, "usage": {**usage, "output_tokens": 0}
+        }})
+        self._send_event("content_block_start", {
+            "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}
+        })
+        for i, word in enumerate(text.split(" ")):
+            time.sleep(self.token_interval)
+            self._send_event("content_block_delta", {
+                "type": "content_block_delta", "index": 0,
+                "delta": {"type": "text_delta", "text": word if i == 0 else " " + word}
+            })
+        self._send_event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        self._send_event("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": usage["output_tokens"]}
+        })
+        self._send_event("message_stop", {"type": "message_stop"})
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} {format % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.5, help='seconds before each reply')
+    parser.add_argument('--jitter', type=float, default=0.5, help='extra random delay, up to this many seconds')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of requests answered with a 529')
+    parser.add_argument('--token-interval', type=float, default=0.02, help='seconds between streamed words')
+    args = parser.parse_args()
+
+    StubHandler.delay = args.delay
+    StubHandler.jitter = args.jitter
+    StubHandler.fail_rate = args.fail_rate
+    StubHandler.token_interval = args.token_interval
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"Stub Anthropic API on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()